@@ -0,0 +1,49 @@
+import argparse
+import sys
+from . import core
+from . import control
+from . import vision
+from .runner import run, compare, load, save
+
+
+if __name__ == '__main__':
+
+  parser = argparse.ArgumentParser(
+    prog='python -m benchmarks',
+    description='Syedra block runtime and vision benchmarks')
+  parser.add_argument(
+    '-k', '--filter', default=None,
+    help='only run benchmarks whose name contains this string')
+  parser.add_argument(
+    '--max-size', type=int, default=None,
+    help='skip benchmark sizes larger than this')
+  parser.add_argument(
+    '--repeat', type=int, default=5,
+    help='number of timed repetitions')
+  parser.add_argument(
+    '--duration', type=float, default=0.2,
+    help='target duration of a repetition in seconds')
+  parser.add_argument(
+    '-o', '--output', default=None,
+    help='write results as JSON to this file')
+  parser.add_argument(
+    '-c', '--compare', default=None,
+    help='baseline JSON results to compare against')
+  parser.add_argument(
+    '--threshold', type=float, default=0.1,
+    help='relative slowdown reported as regression')
+  args = parser.parse_args()
+
+  results = run(
+    pattern=args.filter, max_size=args.max_size,
+    repeat=args.repeat, duration=args.duration)
+  if args.output:
+    save(args.output, results)
+  if args.compare:
+    regressions = compare(
+      results, load(args.compare), threshold=args.threshold)
+    for regression in regressions:
+      print(f"REGRESSION {regression['name']} "
+            f"[{regression['size']}]: "
+            f"x{regression['ratio']:.2f}", file=sys.stderr)
+    sys.exit(1 if regressions else 0)
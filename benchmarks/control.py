@@ -0,0 +1,42 @@
+try:
+  import numpy as np
+except ImportError:
+  np = None
+from .runner import benchmark
+
+
+SIZES = [10, 100, 1000]
+
+
+if np is not None:
+
+  from syedra.core.block import Graph
+  from syedra.control.pid import PID
+  from syedra.control.bank import PIDBank
+
+  class Loop(PID):
+
+    def _get_error(self):
+      return -self.reading
+
+  @benchmark('control.pid', sizes=SIZES,
+             operations=lambda size: size)
+  def pid(size):
+    with Graph():
+      loops = [Loop(p_gain=1.0, d_gain=0.1, i_gain=0.01)
+               for _ in range(size)]
+    for loop in loops:
+      loop['reading'].value = 1.0
+    def update():
+      for loop in loops:
+        loop.update()
+    return update
+
+  @benchmark('control.pid_bank', sizes=SIZES,
+             operations=lambda size: size)
+  def pid_bank(size):
+    with Graph():
+      bank = PIDBank(
+        channels=size, p_gain=1.0, d_gain=0.1, i_gain=0.01)
+    bank['reading'].value = np.ones(size)
+    return bank.update
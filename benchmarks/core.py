@@ -0,0 +1,270 @@
+import asyncio
+try:
+  import numpy as np
+except ImportError:
+  np = None
+from syedra.core.block import Block, Graph, InputPort, OutputPort, Executors
+from syedra.core.fsm import Machine, MachineArray, State, Event
+from .runner import benchmark
+
+
+SIZES = [10, 100, 1000, 10000]
+
+
+class Source(Block):
+  block_name = 'Source'
+
+  y = OutputPort(initial=0)
+
+  def update(self):
+    self.y += 1
+
+
+class Relay(Block):
+  block_name = 'Relay'
+
+  x = InputPort()
+  y = OutputPort(initial=0)
+
+  def update(self):
+    self.y = self.x
+
+
+class Join(Block):
+  block_name = 'Join'
+
+  a = InputPort()
+  b = InputPort()
+  y = OutputPort(initial=0)
+
+  def update(self):
+    self.y = self.a + self.b
+
+
+def chain(size:int) -> Block:
+  '''Source followed by a linear chain of relays'''
+  source = previous = Source()
+  for _ in range(size - 1):
+    relay = Relay()
+    previous['y'] >> relay['x']
+    previous = relay
+  return source
+
+
+def tree(size:int) -> Block:
+  '''Source fanning out as a binary tree of relays'''
+  source = Source()
+  frontier = [source]
+  count = 1
+  while count < size:
+    parent = frontier.pop(0)
+    for _ in range(2):
+      if count >= size:
+        break
+      relay = Relay()
+      parent['y'] >> relay['x']
+      frontier.append(relay)
+      count += 1
+  return source
+
+
+def dag(size:int) -> Block:
+  '''Source feeding layers of joins, each join consuming two
+  neighbouring blocks of the previous layer'''
+  width = max(2, int(size ** 0.5))
+  source = Source()
+  layer = list()
+  for _ in range(width):
+    relay = Relay()
+    source['y'] >> relay['x']
+    layer.append(relay)
+  count = 1 + width
+  while count + width <= size:
+    joins = [Join() for _ in range(width)]
+    for i,join in enumerate(joins):
+      layer[i]['y'] >> join['a']
+      layer[(i + 1) % width]['y'] >> join['b']
+    layer = joins
+    count += width
+  return source
+
+
+SHAPES = {'chain': chain, 'tree': tree, 'dag': dag}
+
+
+def scoped(shape, size:int) -> Block:
+  with Graph(name=shape.__name__):
+    return shape(size)
+
+
+for name,shape in SHAPES.items():
+
+  @benchmark(f'core.execute.{name}', sizes=SIZES,
+             operations=lambda size: size)
+  def execute(size, shape=shape):
+    start = scoped(shape, size)
+    return lambda: Block.execute(start)
+
+  @benchmark(f'core.schedule.{name}', sizes=SIZES,
+             operations=lambda size: size)
+  def schedule(size, shape=shape):
+    schedule = Block.compile(scoped(shape, size))
+    return lambda: Block.execute(schedule)
+
+  @benchmark(f'core.compile.{name}', sizes=SIZES,
+             operations=lambda size: size)
+  def compile(size, shape=shape):
+    start = scoped(shape, size)
+    return lambda: Block.compile(start)
+
+  @benchmark(f'core.build.{name}', sizes=SIZES,
+             operations=lambda size: size)
+  def build(size, shape=shape):
+    return lambda: scoped(shape, size)
+
+
+def chain_spec(size:int) -> tuple:
+  '''Graph.build specification of the chain shape'''
+  blocks = {'block0': Source}
+  blocks.update({f'block{i}': Relay for i in range(1, size)})
+  edges = [(f'block{i}.y', f'block{i + 1}.x') for i in range(size - 1)]
+  return blocks, edges
+
+
+@benchmark('core.graph_build.chain', sizes=SIZES,
+           operations=lambda size: size)
+def graph_build(size):
+  blocks, edges = chain_spec(size)
+  return lambda: Graph(name='chain').build(blocks, edges)
+
+
+@benchmark('core.graph_build.chain_paused', sizes=SIZES,
+           operations=lambda size: size)
+def graph_build_paused(size):
+  blocks, edges = chain_spec(size)
+  return lambda: Graph(name='chain').build(
+    blocks, edges, pause_gc=True)
+
+
+def async_setup(shape, size:int, executor=None):
+  loop = asyncio.new_event_loop()
+  async def build():
+    with Graph(name=shape.__name__, executor=executor):
+      return shape(size)
+  start = loop.run_until_complete(build())
+  return lambda: loop.run_until_complete(Block.async_execute(start))
+
+
+for name,shape in SHAPES.items():
+
+  @benchmark(f'core.async_execute.{name}', sizes=SIZES[:3],
+             operations=lambda size: size)
+  def async_execute(size, shape=shape):
+    return async_setup(shape, size)
+
+  @benchmark(f'core.async_execute_inline.{name}', sizes=SIZES,
+             operations=lambda size: size)
+  def async_execute_inline(size, shape=shape):
+    return async_setup(shape, size, executor=Executors.INLINE)
+
+
+@benchmark('core.port.get', sizes=[1000], operations=lambda size: size)
+def port_get(size):
+  with Graph():
+    source = Source()
+    relay = Relay()
+    source['y'] >> relay['x']
+  def run():
+    for _ in range(size):
+      relay.x
+  return run
+
+
+@benchmark('core.port.set', sizes=[1000], operations=lambda size: size)
+def port_set(size):
+  with Graph():
+    source = Source()
+    relay = Relay()
+    source['y'] >> relay['x']
+  def run():
+    for i in range(size):
+      source.y = i
+  return run
+
+
+@benchmark('core.node.merge_detach', sizes=[10, 100, 1000],
+           operations=lambda size: 2 * size)
+def merge_detach(size):
+  with Graph():
+    source = Source()
+    relays = [Relay() for _ in range(size)]
+  def run():
+    for relay in relays:
+      source['y'] >> relay['x']
+    for relay in relays:
+      relay('x').detach()
+  return run
+
+
+class Follower(Machine):
+  machine_name = 'Follower'
+
+  distance = 3.0
+
+  idle = State()
+  near = State()
+  far = State()
+
+  approach = Event(check=lambda m: m.distance < 1.0,
+                   inputs=['distance'])
+  retreat = Event(check=lambda m: m.distance > 5.0,
+                  inputs=['distance'])
+  lost = Event(check=lambda m: m.distance > 9.0,
+               inputs=['distance'])
+
+  transitions = [
+    ('idle', 'approach', 'near'),
+    ('idle', 'retreat', 'far'),
+    ('idle', 'lost', 'far'),
+    ('near', 'retreat', 'idle'),
+    ('far', 'approach', 'idle'),
+  ]
+  initial = 'idle'
+
+
+for mode in Machine.Mode:
+
+  @benchmark(f'core.fsm.{mode.name.lower()}', sizes=[10, 100, 1000],
+             operations=lambda size: size)
+  def fsm_update(size, mode=mode):
+    machines = [Follower(mode=mode) for _ in range(size)]
+    def run():
+      for machine in machines:
+        machine.update()
+    return run
+
+  # the distance changes every tick, hence event driven
+  # machines re-check their events at every update
+  @benchmark(f'core.fsm.{mode.name.lower()}_moving',
+             sizes=[10, 100, 1000], operations=lambda size: size)
+  def fsm_update_moving(size, mode=mode):
+    machines = [Follower(mode=mode) for _ in range(size)]
+    distances = [0.5, 3.0, 6.0, 9.5, 6.0, 3.0]
+    tick = [0]
+    def run():
+      distance = distances[tick[0] % len(distances)]
+      tick[0] += 1
+      for machine in machines:
+        machine.distance = distance
+        machine.update()
+    return run
+
+
+if np is not None:
+
+  @benchmark('core.fsm.array', sizes=[1000, 100000],
+             operations=lambda size: size)
+  def fsm_array(size):
+    machines = MachineArray(Follower, size=size)
+    machines.distance = np.random.default_rng(0).uniform(0, 10, size)
+    return machines.update
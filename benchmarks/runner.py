@@ -0,0 +1,135 @@
+from __future__ import annotations
+import json
+import statistics
+import time
+from typing import Callable, List
+
+
+__all__ = [
+  'Benchmark',
+  'benchmark',
+  'run',
+  'compare',
+]
+
+
+class Benchmark:
+  '''Benchmark is a named measurement. Its setup function
+  receives the size parameter and returns the callable to be
+  timed. Each call of the timed callable performs the given
+  number of operations.'''
+
+  __registry = dict()
+
+  def __init__(self, name:str, setup:Callable, sizes:List[int],
+               operations:Callable[[int], int]=None):
+    self.name = name
+    self.setup = setup
+    self.sizes = sizes
+    self.operations = operations or (lambda size: 1)
+
+  @staticmethod
+  def register(benchmark:Benchmark) -> Benchmark:
+    Benchmark.__registry[benchmark.name] = benchmark
+    return benchmark
+
+  @staticmethod
+  def all() -> List[Benchmark]:
+    return list(Benchmark.__registry.values())
+
+  def measure(self, size:int, repeat:int=5,
+              duration:float=0.2) -> dict:
+    '''Times the benchmark for the given size. The number of
+    calls per repetition is calibrated so that a repetition
+    lasts about the given duration in seconds.'''
+    function = self.setup(size)
+    number = 1
+    while True:
+      start = time.perf_counter()
+      for _ in range(number):
+        function()
+      elapsed = time.perf_counter() - start
+      if elapsed >= duration / 10 or number >= 1 << 20:
+        break
+      number *= 2
+    number = max(1, int(number * duration / 10 / max(elapsed, 1e-9)))
+    timings = list()
+    for _ in range(repeat):
+      start = time.perf_counter()
+      for _ in range(number):
+        function()
+      timings.append((time.perf_counter() - start) / number)
+    operations = self.operations(size)
+    return {
+      'name': self.name,
+      'size': size,
+      'calls': number * repeat,
+      'min': min(timings),
+      'median': statistics.median(timings),
+      'per_operation': min(timings) / operations,
+    }
+
+
+def benchmark(name:str, sizes:List[int]=(1,),
+              operations:Callable[[int], int]=None):
+  '''Decorator registering a benchmark setup function'''
+  def decorator(setup:Callable):
+    Benchmark.register(Benchmark(
+      name=name, setup=setup, sizes=list(sizes),
+      operations=operations))
+    return setup
+  return decorator
+
+
+def run(pattern:str=None, max_size:int=None, repeat:int=5,
+        duration:float=0.2, verbose:bool=True) -> List[dict]:
+  '''Runs the registered benchmarks whose names contain the
+  pattern and returns the results'''
+  results = list()
+  for bench in Benchmark.all():
+    if pattern and pattern not in bench.name:
+      continue
+    for size in bench.sizes:
+      if max_size is not None and size > max_size:
+        continue
+      result = bench.measure(
+        size=size, repeat=repeat, duration=duration)
+      results.append(result)
+      if verbose:
+        print(f"{result['name']:<40} {size:>6} "
+              f"{result['min']*1e6:>12.2f} us "
+              f"{result['per_operation']*1e9:>12.1f} ns/op")
+  return results
+
+
+def compare(results:List[dict], baseline:List[dict],
+            threshold:float=0.1) -> List[dict]:
+  '''Compares the results against a baseline and returns the
+  entries slower than the baseline by more than the relative
+  threshold'''
+  reference = {(r['name'], r['size']): r for r in baseline}
+  regressions = list()
+  for result in results:
+    base = reference.get((result['name'], result['size']))
+    if base is None:
+      continue
+    ratio = result['min'] / base['min']
+    if ratio > 1.0 + threshold:
+      regressions.append({
+        'name': result['name'],
+        'size': result['size'],
+        'baseline': base['min'],
+        'current': result['min'],
+        'ratio': ratio,
+      })
+  return regressions
+
+
+def load(path:str) -> List[dict]:
+  with open(path) as f:
+    return json.load(f)['results']
+
+
+def save(path:str, results:List[dict]):
+  with open(path, 'w') as f:
+    json.dump({'results': results}, f, indent=2)
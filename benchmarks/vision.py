@@ -0,0 +1,138 @@
+try:
+  import numpy as np
+  import cv2
+except ImportError:
+  np = None
+from .runner import benchmark
+
+
+RESOLUTIONS = {
+  480: (480, 640),
+  720: (720, 1280),
+  1080: (1080, 1920),
+}
+SIZES = list(RESOLUTIONS)
+
+
+def frame(size:int, blobs:int=1):
+  '''Synthetic BGR frame of noise with saturated blue disks'''
+  height, width = RESOLUTIONS[size]
+  generator = np.random.default_rng(seed=size)
+  image = generator.integers(
+    0, 64, size=(height, width, 3), dtype=np.uint8)
+  for index in range(blobs):
+    center = (
+      int(generator.integers(width // 8, 7 * width // 8)),
+      int(generator.integers(height // 8, 7 * height // 8)))
+    cv2.circle(image, center, height // (8 + index), (255, 0, 0), -1)
+  return image
+
+
+def prepare(block, port:str, value):
+  block[port].value = value
+  return block.update
+
+
+if np is not None:
+
+  from syedra.core.block import Graph
+  from syedra.vision.transform import Convert, Crop, BatchConvert
+  from syedra.vision.detect import Mask, ColorMask, Blob, BatchMask
+  from syedra.vision.buffer import FramePool
+
+  HSV_BLUE = ([100, 100, 100], [130, 255, 255])
+
+  @benchmark('vision.convert', sizes=SIZES)
+  def convert(size):
+    with Graph():
+      block = Convert(mapping=Convert.Mapping.BGR2HSV)
+    return prepare(block, 'original', frame(size))
+
+  @benchmark('vision.convert_pooled', sizes=SIZES)
+  def convert_pooled(size):
+    with Graph():
+      block = Convert(
+        mapping=Convert.Mapping.BGR2HSV, pool=FramePool())
+    return prepare(block, 'original', frame(size))
+
+  @benchmark('vision.mask', sizes=SIZES)
+  def mask(size):
+    hsv = cv2.cvtColor(frame(size), cv2.COLOR_BGR2HSV)
+    with Graph():
+      block = Mask(*HSV_BLUE)
+    return prepare(block, 'original', hsv)
+
+  @benchmark('vision.mask_pooled', sizes=SIZES)
+  def mask_pooled(size):
+    hsv = cv2.cvtColor(frame(size), cv2.COLOR_BGR2HSV)
+    with Graph():
+      block = Mask(*HSV_BLUE, pool=FramePool())
+    return prepare(block, 'original', hsv)
+
+  @benchmark('vision.color_mask', sizes=SIZES)
+  def color_mask(size):
+    with Graph():
+      block = ColorMask(*HSV_BLUE, pool=FramePool())
+    return prepare(block, 'original', frame(size))
+
+  @benchmark('vision.blob', sizes=SIZES)
+  def blob(size):
+    hsv = cv2.cvtColor(frame(size, blobs=3), cv2.COLOR_BGR2HSV)
+    selected = cv2.inRange(hsv, *map(np.array, HSV_BLUE))
+    with Graph():
+      block = Blob(min_size=200)
+    return prepare(block, 'image', selected)
+
+  @benchmark('vision.blob_noisy', sizes=SIZES)
+  def blob_noisy(size):
+    height, width = RESOLUTIONS[size]
+    generator = np.random.default_rng(seed=size)
+    selected = np.where(
+      generator.random((height, width)) > 0.9, 255, 0
+    ).astype(np.uint8)
+    with Graph():
+      block = Blob(min_size=1)
+    return prepare(block, 'image', selected)
+
+  @benchmark('vision.blob_noisy_components', sizes=SIZES)
+  def blob_noisy_components(size):
+    height, width = RESOLUTIONS[size]
+    generator = np.random.default_rng(seed=size)
+    selected = np.where(
+      generator.random((height, width)) > 0.9, 255, 0
+    ).astype(np.uint8)
+    with Graph():
+      block = Blob(min_size=1, backend=Blob.Backend.COMPONENTS)
+    return prepare(block, 'image', selected)
+
+  @benchmark('vision.crop', sizes=SIZES)
+  def crop(size):
+    height, width = RESOLUTIONS[size]
+    with Graph():
+      block = Crop(
+        left=width // 4, top=height // 4,
+        right=3 * width // 4, bottom=3 * height // 4)
+    return prepare(block, 'original', frame(size))
+
+  BATCHES = [1, 4, 16]
+
+  def batch(count:int):
+    return np.stack([frame(480) for _ in range(count)])
+
+  @benchmark('vision.batch_convert', sizes=BATCHES,
+             operations=lambda count: count)
+  def batch_convert(count):
+    with Graph():
+      block = BatchConvert(mapping=Convert.Mapping.BGR2HSV)
+    return prepare(block, 'original', batch(count))
+
+  @benchmark('vision.batch_mask', sizes=BATCHES,
+             operations=lambda count: count)
+  def batch_mask(count):
+    frames = batch(count)
+    hsv = cv2.cvtColor(
+      frames.reshape(-1, *frames.shape[2:]), cv2.COLOR_BGR2HSV
+    ).reshape(frames.shape)
+    with Graph():
+      block = BatchMask(*HSV_BLUE)
+    return prepare(block, 'original', hsv)
@@ -1 +1,2 @@
 from .pid import *
+from .bank import *
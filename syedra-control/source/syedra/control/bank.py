@@ -0,0 +1,125 @@
+from __future__ import annotations
+from typing import List, Union
+import numpy as np
+from syedra.core.block import Block, InputPort, OutputPort, Executors
+from syedra.core.clock import Clock
+
+
+__all__ = [
+  'PIDBank',
+]
+
+
+class PIDBank(Block):
+  '''PIDBank runs a bank of independent PID loops over arrays
+  of readings in a single vectorized update. Each channel
+  produces exactly the results of a PID instance with the
+  gains of the channel, the error being the set point minus
+  the reading. Values that are None for a PID are NaN for
+  the channels of the bank, a NaN reading invalidates the
+  channel as a None error does.
+
+  The integral error of each channel is clamped to
+  [-i_limit, i_limit] if i_limit is given, to prevent windup
+  while the command is saturated.'''
+
+  executor = Executors.INLINE
+
+  reading = InputPort()
+  set_point = InputPort(initial=0.0, trigger=False)
+  command = OutputPort(initial=None)
+  error = OutputPort(initial=None)
+  d_error = OutputPort(initial=None)
+  i_error = OutputPort(initial=None)
+
+  def __init__(self,
+               channels:int,
+               p_gain:Union[float, List[float]]=0.0,
+               d_gain:Union[float, List[float]]=0.0,
+               i_gain:Union[float, List[float]]=0.0,
+               i_limit:Union[float, List[float]]=None,
+               name:str='PID Bank'):
+    super().__init__(name=name)
+    assert channels > 0, 'Channel count must be a positive integer'
+    self.__channels = channels
+    self.set_gains(p_gain, d_gain, i_gain)
+    self.set_i_limit(i_limit)
+    self.__error_prev = self.__invalid()
+    self.__time_prev = self.__invalid()
+    self.reset()
+
+  @property
+  def channels(self) -> int:
+    return self.__channels
+
+  def __invalid(self) -> np.ndarray:
+    return np.full(self.__channels, np.nan)
+
+  def __per_channel(self, value) -> np.ndarray:
+    return np.broadcast_to(
+      np.asarray(value, dtype=np.float64),
+      (self.__channels,)).copy()
+
+  def _get_error(self) -> np.ndarray:
+    '''Child class may override this method to implement how
+    the errors are computed from the readings.'''
+    return (np.asarray(self.set_point, dtype=np.float64) -
+            np.asarray(self.reading, dtype=np.float64))
+
+  def update(self):
+    error = self.__per_channel(self._get_error())
+    time_now = Clock.current().now()
+    valid = ~(np.isnan(error) |
+              np.isnan(self.__error_prev) |
+              np.isnan(self.__time_prev))
+    with np.errstate(invalid='ignore', divide='ignore'):
+      time_delta = time_now - self.__time_prev
+      d_error = (error - self.__error_prev) / time_delta
+      i_error = (np.nan_to_num(self.i_error, nan=0.0) +
+                 error * time_delta)
+      if self.__i_limit is not None:
+        i_error = np.clip(i_error, -self.__i_limit, self.__i_limit)
+      command = -1 * (
+        self.__p_gain * error +
+        self.__d_gain * d_error +
+        self.__i_gain * i_error)
+    self.error = error
+    self.d_error = np.where(valid, d_error, np.nan)
+    self.i_error = np.where(valid, i_error, np.nan)
+    self.command = np.where(valid, command, np.nan)
+    self.__time_prev = np.full(self.__channels, time_now)
+    self.__error_prev = error
+
+  def set_gains(self,
+                p_gain:Union[float, List[float]]=None,
+                d_gain:Union[float, List[float]]=None,
+                i_gain:Union[float, List[float]]=None):
+    '''Sets the gains of all channels from scalars or per
+    channel lists. As with PID, gains that are not given are
+    set to zero.'''
+    self.__p_gain = self.__per_channel(
+      0.0 if p_gain is None else p_gain)
+    self.__d_gain = self.__per_channel(
+      0.0 if d_gain is None else d_gain)
+    self.__i_gain = self.__per_channel(
+      0.0 if i_gain is None else i_gain)
+
+  def set_i_limit(self, i_limit:Union[float, List[float]]=None):
+    '''Sets the integral error limits, no limit if None'''
+    self.__i_limit = (
+      None if i_limit is None else self.__per_channel(i_limit))
+
+  def reset(self, channels:Union[int, List[int], np.ndarray]=None):
+    '''Resets the given channels, indices or a boolean mask,
+    or all channels if None'''
+    if channels is None:
+      channels = slice(None)
+    self.__error_prev = self.__error_prev.copy()
+    self.__error_prev[channels] = np.nan
+    self.__time_prev = self.__time_prev.copy()
+    self.__time_prev[channels] = np.nan
+    for name in ('error', 'd_error', 'i_error', 'command'):
+      value = getattr(self, name)
+      value = self.__invalid() if value is None else value.copy()
+      value[channels] = np.nan
+      setattr(self, name, value)
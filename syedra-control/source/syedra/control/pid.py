@@ -1,5 +1,5 @@
-from syedra.core.block import Block, InputPort, OutputPort
-from time import time
+from syedra.core.block import Block, InputPort, OutputPort, Executors
+from syedra.core.clock import Clock
 
 
 __all__ = [
@@ -8,6 +8,11 @@ __all__ = [
 
 
 class PID(Block):
+  '''PID controller. The integral error is clamped to
+  [-i_limit, i_limit] if i_limit is given, to prevent windup
+  while the command is saturated.'''
+
+  executor = Executors.INLINE
 
   reading = InputPort()
   command = OutputPort(initial=None)
@@ -19,9 +24,11 @@ class PID(Block):
                p_gain:float=0.0,
                d_gain:float=0.0,
                i_gain:float=0.0,
+               i_limit:float=None,
                name:str='PID'):
     super().__init__(name=name)
     self.set_gains(p_gain, d_gain, i_gain)
+    self.__i_limit = i_limit
     self.reset()
 
   def _get_error(self) -> float:
@@ -31,13 +38,16 @@ class PID(Block):
     
   def update(self):
     self.error = self._get_error()
-    time_now = time()
+    time_now = Clock.current().now()
     if (self.error is not None and
         self.__error_prev is not None and
         self.__time_prev is not None):
       time_delta = time_now - self.__time_prev
       self.d_error = (self.error - self.__error_prev) / time_delta
       self.i_error = (self.i_error or 0.0) + self.error * time_delta
+      if self.__i_limit is not None:
+        self.i_error = min(
+          max(self.i_error, -self.__i_limit), self.__i_limit)
       self.command = -1 * (
         self.__p_gain * self.error +
         self.__d_gain * self.d_error +
@@ -0,0 +1,55 @@
+from syedra.core.block import Block, InputPort, OutputPort
+from syedra.core.clock import Clock, SimulatedClock
+from syedra.core.scheduler import Scheduler
+from syedra.control.pid import PID
+
+
+
+class Plant(Block):
+  '''First order plant driven by the controller command,
+  integrated on the current clock'''
+  block_name = 'Plant'
+
+  command = InputPort(initial=None, trigger=False)
+  reading = OutputPort(initial=0.0)
+
+  def __init__(self, time_constant:float=0.5):
+    super().__init__()
+    self.__tau = time_constant
+    self.__time_prev = None
+
+  def update(self):
+    time_now = Clock.current().now()
+    if self.__time_prev is not None and self.command is not None:
+      time_delta = time_now - self.__time_prev
+      self.reading += (
+        (self.command - self.reading) * time_delta / self.__tau)
+    self.__time_prev = time_now
+
+
+class Controller(PID):
+
+  def __init__(self, set_point:float=0.0, **gains):
+    super().__init__(name='Controller', **gains)
+    self.__set_point = set_point
+
+  def _get_error(self):
+    return self.reading - self.__set_point
+
+
+if __name__ == '__main__':
+
+  for p_gain in [0.5, 1.0, 2.0, 4.0]:
+    plant = Plant(time_constant=0.5)
+    controller = Controller(
+      set_point=1.0, p_gain=p_gain, i_gain=2.0)
+
+    plant['reading'] >> controller['reading']
+    controller['command'] >> plant['command']
+
+    scheduler = Scheduler(clock=SimulatedClock())
+    scheduler.add(plant, frequency=100.0)
+    scheduler.run(duration=60.0)
+    print(f"p_gain: {p_gain:>5.2f} | "
+          f"reading: {plant.reading:>6.3f} | "
+          f"ticks: {scheduler.tasks[0].ticks}")
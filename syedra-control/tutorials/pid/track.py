@@ -1,6 +1,7 @@
-from time import time, sleep
+from time import time
 import numpy as np
 from syedra.core.block import Block, InputPort, OutputPort
+from syedra.core.scheduler import Scheduler
 from syedra.control.pid import PID
 
 
@@ -56,6 +57,6 @@ if __name__ == '__main__':
   controller['error'] >> printer['error']
   controller['command'] >> printer['command']
 
-  for _ in range(10):
-    Block.execute(sensor)
-    sleep(0.1)
+  scheduler = Scheduler()
+  scheduler.add(sensor, frequency=10.0)
+  scheduler.run(duration=1.0)
@@ -1,2 +1,6 @@
 from .block import *
+from .clock import *
 from .fsm import *
+from .pipeline import *
+from .scheduler import *
+from .profile import *
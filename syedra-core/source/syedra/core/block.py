@@ -1,9 +1,13 @@
 from __future__ import annotations
 import asyncio
-from functools import reduce
-from typing import Type, List
+import gc
+import weakref
+from contextvars import ContextVar, copy_context
+from types import MappingProxyType
+from concurrent.futures import (
+  Executor, ThreadPoolExecutor, ProcessPoolExecutor)
+from typing import Dict, List, Tuple, Type, Union
 from enum import Enum
-from functools import reduce
 
 
 
@@ -13,6 +17,9 @@ __all__ = [
   'InputPort',
   'OutputPort',
   'ProxyPort',
+  'Schedule',
+  'Graph',
+  'Executors',
 ]
 
 
@@ -50,13 +57,17 @@ class Port:
     OUTPUT = 'O'
     PROXY = 'P'
   
-  def __init__(self, kind:Kind, initial=None, internal=False):
+  def __init__(self, kind:Kind, initial=None, internal=False,
+               trigger=True):
     self._kind = kind
     self._name = None
     if initial is not None and self._kind == Port.Kind.PROXY:
       raise Port.CannotInitializeError(port=self)
     self._initial = initial
     self._internal = internal
+    self._trigger = trigger
+    self._output = kind == Port.Kind.OUTPUT
+    self._triggers = kind == Port.Kind.INPUT and trigger
 
   @property
   def is_input(self):
@@ -70,16 +81,22 @@ class Port:
   def is_internal(self):
     return self._internal
 
+  @property
+  def is_trigger(self):
+    return self._triggers
+
   @property
   def initial(self):
     return self._initial
 
   def __get__(self, block:Block, owner):
-    return block._latches[self._name]._node.value
+    if block is None:
+      return self
+    return block._latches[self._name]._node._value
 
   def __set__(self, block:Block, value):
-    if self.is_output:
-      block._latches[self._name]._node.value = value
+    if self._output:
+      block._latches[self._name]._node._value = value
     else:
       raise Port.ImmutableError(block=block, port=self)
   
@@ -91,11 +108,14 @@ class Port:
   
 
 class InputPort(Port):
-  '''Input kind Port'''
+  '''Input kind Port. A non-trigger input is read when its
+  block is updated but does not take part in the execution
+  scheduling, the block does not wait for a token on it.'''
 
-  def __init__(self, initial=None, internal=False):
+  def __init__(self, initial=None, internal=False, trigger=True):
     super().__init__(
-      kind=Port.Kind.INPUT, initial=initial, internal=internal)
+      kind=Port.Kind.INPUT, initial=initial, internal=internal,
+      trigger=trigger)
 
 
 class OutputPort(Port):
@@ -112,6 +132,346 @@ class ProxyPort(Port):
     super().__init__(kind=Port.Kind.PROXY, initial=initial)
     
     
+class Executors:
+  '''Executors is the registry of named executors employed
+  by the asynchronous update process of blocks. The executor
+  of a block is specified by its executor attribute, falling
+  back to the executor of its graph, which can be:
+
+    - None : the default executor of the asyncio loop
+    - Executors.INLINE : update is called directly in the
+      loop without any thread hop (for trivial blocks)
+    - a registered executor name
+    - a concurrent.futures.Executor instance
+
+  Blocks executed in a process pool must be picklable
+  excluding their ports. The update is performed on a copy
+  of the block in the worker process and the resulting port
+  values and block attributes are copied back.'''
+
+  INLINE = 'inline'
+
+  class DoesNotExist(Exception):
+    def __init__(self, name:str):
+      super().__init__(f"Executor {name} does not exist")
+
+  class ConflictError(Exception):
+    def __init__(self, name:str):
+      super().__init__(f"Executor {name} already exists")
+
+  __registry = dict()
+
+  @staticmethod
+  def register(name:str, executor:Executor) -> Executor:
+    if name == Executors.INLINE or name in Executors.__registry:
+      raise Executors.ConflictError(name=name)
+    Executors.__registry[name] = executor
+    return executor
+
+  @staticmethod
+  def thread_pool(name:str, max_workers:int=None) -> Executor:
+    '''Creates and registers a dedicated thread pool'''
+    return Executors.register(
+      name, ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix=name))
+
+  @staticmethod
+  def process_pool(name:str, max_workers:int=None) -> Executor:
+    '''Creates and registers a dedicated process pool'''
+    return Executors.register(
+      name, ProcessPoolExecutor(max_workers=max_workers))
+
+  @staticmethod
+  def get(executor:Union[Executor, str]) -> Union[Executor, str]:
+    '''Resolves an executor specification'''
+    if executor is None or executor == Executors.INLINE:
+      return executor
+    if isinstance(executor, str):
+      try:
+        return Executors.__registry[executor]
+      except KeyError:
+        raise Executors.DoesNotExist(name=executor)
+    return executor
+
+  @staticmethod
+  def shutdown(name:str=None, wait:bool=True):
+    '''Shuts down and unregisters the named executor or all
+    registered executors if no name is given.'''
+    names = [name] if name else list(Executors.__registry)
+    for name in names:
+      Executors.get(name).shutdown(wait=wait)
+      del Executors.__registry[name]
+
+
+class Slot:
+  '''Slot is a detached stand-in for a Latch holding a port
+  value. It is employed to update a copy of a block in a
+  worker process.'''
+
+  __slots__ = ('_node', '_value')
+
+  def __init__(self, value):
+    self._node = self
+    self._value = value
+
+  @property
+  def value(self):
+    return self._value
+
+  @value.setter
+  def value(self, v):
+    self._value = v
+
+
+def remote_update(cls:Type[Block], state:dict, values:dict):
+  '''Updates a detached copy of a block and returns the
+  resulting port values and attributes.'''
+  block = cls.__new__(cls)
+  block.__dict__.update(state)
+  block._latches = {
+    name: Slot(value) for name,value in values.items()}
+  block.update()
+  values = {
+    name: slot.value for name,slot in block._latches.items()}
+  del block._latches
+  return values, block.__dict__
+
+
+class Graph:
+  '''Graph is the container of a block system. It owns the
+  Block and Node instances created within its scope and
+  bounds the block execution readiness evaluation to its
+  members only. Blocks are assigned to the graph active at
+  their creation unless a graph is given explicitly. Graph
+  scopes are local to the thread or asyncio task entering
+  them.
+
+  Blocks created outside of any graph scope belong to the
+  default graph which only keeps weak references to its
+  members so that block systems that are no longer
+  referenced are released.'''
+
+  class CrossingError(Exception):
+    def __init__(self, node1:Node, node2:Node):
+      super().__init__(
+        f"{node1} and {node2} belong to different graphs "
+        "cannot be merged")
+
+  class DisposedError(Exception):
+    def __init__(self, graph:Graph):
+      super().__init__(f"Graph {graph} has been disposed")
+
+  __default = None
+  __scopes = ContextVar('graph_scopes', default=())
+
+  def __init__(self, name:str=None, weak:bool=False,
+               executor:Union[Executor, str]=None):
+    self.__name = name or 'Graph'
+    self.__weak = weak
+    self.executor = executor
+    self.__disposed = False
+    self._blocks = weakref.WeakSet() if weak else set()
+    self._nodes = weakref.WeakSet() if weak else set()
+    self._revision = 0
+    self._ready = list()
+    self._marked = list()
+    self._attached = None
+    self._attached_class = None
+
+  @property
+  def name(self) -> str:
+    return self.__name
+
+  def __str__(self):
+    return self.name
+
+  @staticmethod
+  def default() -> Graph:
+    '''Returns the graph of the blocks created outside of
+    any graph scope'''
+    if Graph.__default is None:
+      Graph.__default = Graph(name='Default', weak=True)
+    return Graph.__default
+
+  @staticmethod
+  def current() -> Graph:
+    '''Returns the innermost active graph scope'''
+    scopes = Graph.__scopes.get()
+    if scopes:
+      return scopes[-1]
+    return Graph.default()
+
+  def __enter__(self):
+    Graph.__scopes.set(Graph.__scopes.get() + (self,))
+    return self
+
+  def __exit__(self, *args):
+    scopes = Graph.__scopes.get()
+    assert scopes and scopes[-1] is self, \
+      'Graph scopes must be exited in reverse order'
+    Graph.__scopes.set(scopes[:-1])
+
+  @property
+  def is_disposed(self) -> bool:
+    return self.__disposed
+
+  def blocks(self):
+    return self._blocks
+
+  def nodes(self):
+    return self._nodes
+
+  def _add_block(self, block:Block):
+    if self.__disposed:
+      raise Graph.DisposedError(graph=self)
+    self._blocks.add(block)
+
+  def _add_node(self, node:Node):
+    self._nodes.add(node)
+
+  def _remove_node(self, node:Node):
+    self._nodes.discard(node)
+
+  def connect(self, edges:List[Tuple[Tuple[Block, str],
+                                      Tuple[Block, str]]]):
+    '''Connects the ports of the (block, port name) pairs of
+    each edge, as joining the nodes one by one with >> does,
+    but invalidating the schedules of the graph only once.'''
+    for (block1, port1),(block2, port2) in edges:
+      block1(port1)._node._join(block2(port2)._node)
+    self.invalidate()
+
+  def build(self, blocks:Dict[str, Union[Type[Block],
+                                         Tuple[Type[Block], dict]]],
+            edges:List[Tuple[str, str]],
+            pause_gc:bool=False) -> Dict[str, Block]:
+    '''Builds a block system in the graph from a declarative
+    specification and returns the blocks by name. Blocks are
+    given by name as a Block class or a (Block class, keyword
+    arguments) pair, edges as pairs of "block.port" names.
+
+      graph.build(
+        blocks={'source': Source, 'gain': (Gain, {'k': 2})},
+        edges=[('source.y', 'gain.x')])
+
+    The input latches of a block are created directly in the
+    nodes of the blocks built before it that drive them,
+    rather than in nodes of their own merged edge by edge.
+
+    pause_gc: disables the garbage collector of the process
+    while building, which shortens the construction of large
+    systems but also stops collection in all other threads
+    meanwhile.'''
+    built = dict()
+    # the edges are grouped by sink block as flat (source block,
+    # source port, sink port) sequences, sparing the garbage
+    # collector a container per edge
+    sinks = dict()
+    for source,sink in edges:
+      split1, split2 = source.rfind('.'), sink.rfind('.')
+      block2 = sink[:split2]
+      sinks[block2] = sinks.get(block2, ()) + (
+        source[:split1], source[split1+1:], sink[split2+1:])
+    inputs = dict()
+    attached = dict()
+    pending = list()
+    collecting = pause_gc and gc.isenabled()
+    # the blocks and nodes are long lived, collecting garbage
+    # while they are created only rescans them repeatedly
+    if collecting:
+      gc.disable()
+    try:
+      with self:
+        for name,spec in blocks.items():
+          if isinstance(spec, tuple):
+            cls, kwargs = spec
+          else:
+            cls, kwargs = spec, None
+          ports = inputs.get(cls)
+          if ports is None:
+            ports = inputs[cls] = frozenset(
+              port_name for port_name,port in cls._ports.items()
+              if port.is_input)
+          group = sinks.pop(name, ())
+          for index in range(0, len(group), 3):
+            block1, port1, port2 = (
+              group[index], group[index+1], group[index+2])
+            if (block1 in built and port2 in ports and
+                port2 not in attached):
+              attached[port2] = built[block1](port1)._node
+            else:
+              pending.append((block1, port1, name, port2))
+          if attached:
+            self._attached = attached
+            self._attached_class = cls
+          built[name] = cls(**kwargs) if kwargs else cls()
+          if attached:
+            if self._attached is not None:
+              # the nodes were not taken by the block, joining
+              # the edges already pending again is harmless
+              self._attached = None
+              pending.extend(
+                (group[index], group[index+1], name, group[index+2])
+                for index in range(0, len(group), 3))
+            attached.clear()
+      # edges to blocks that are not specified
+      for name,group in sinks.items():
+        pending.extend(
+          (group[index], group[index+1], name, group[index+2])
+          for index in range(0, len(group), 3))
+      for block1,port1,block2,port2 in pending:
+        built[block1](port1)._node._join(built[block2](port2)._node)
+    finally:
+      self._attached = None
+      if collecting:
+        gc.enable()
+      self.invalidate()
+    return built
+
+  def _enqueue(self, block:Block):
+    profiler = Block.profiler
+    if profiler is not None:
+      block._ready_at = profiler.clock()
+    self._ready.append(block)
+
+  def _mark(self, latch:Latch):
+    self._marked.append(latch)
+
+  def pop_ready_blocks(self) -> List[Block]:
+    '''Dequeues and returns the blocks that are ready for
+    execution'''
+    ready, self._ready = self._ready, list()
+    blocks = list()
+    for block in ready:
+      block._queued = False
+      if block._pending == 0:
+        blocks.append(block)
+    return blocks
+
+  def clear_tokens(self):
+    '''Clears the tokens of all input latches that have
+    received a token and empties the ready queue'''
+    marked, self._marked = self._marked, list()
+    for latch in marked:
+      latch._marked = False
+      latch.token = False
+    self.pop_ready_blocks()
+
+  def invalidate(self):
+    '''Marks the schedules compiled on this graph as
+    outdated'''
+    self._revision += 1
+
+  def dispose(self):
+    '''Releases all blocks and nodes owned by the graph. The
+    graph cannot be populated after disposal.'''
+    self.clear_tokens()
+    self._blocks.clear()
+    self._nodes.clear()
+    self.__disposed = True
+    self.invalidate()
+    
+    
 class BlockMeta(type):
 
   def __new__(cls, name, bases, attrs):
@@ -133,21 +493,36 @@ class Block(metaclass=BlockMeta):
     def __init__(self):
       super().__init__("Block system execution terminated")
   
-  __collection = set()
-
   block_name = None
+  executor = None
+  profiler = None
+  _ready_at = None
+
+  __runtime_attributes = frozenset([
+    '_latches', '_inputs', '_outputs', '_token', 'executor',
+    '_ports',
+    '_pending', '_queued', '_ready_at',
+    '_Block__graph', '_Block__superblock',
+    '_Block__execution_cohord', '_Block__loop', '_Block__lock',
+  ])
+  __detached = MappingProxyType({})
   
-  def __init__(self, name:str=None, superblock:Block=None):
+  def __init__(self, name:str=None, superblock:Block=None,
+               graph:Graph=None):
     self.__name = name or self.block_name
     assert self.__name, \
       'A non emptry string name must be assigned'
     self.__superblock = superblock
+    if graph is None:
+      graph = superblock.graph if superblock else Graph.current()
+    self.__graph = graph
+    self.__graph._add_block(self)
     self.__init_latches()
     self._token = False
-    Block.__collection.add(self)
     self.__execution_cohord = [self]
     if superblock:
       superblock.__execution_cohord.append(self)
+      self.__graph.invalidate()
     try:
       asyncio.get_running_loop()
       self.__loop = asyncio.get_event_loop()
@@ -156,31 +531,63 @@ class Block(metaclass=BlockMeta):
       self.__loop = None
       self.__lock = None
 
+  @property
+  def graph(self) -> Graph:
+    return self.__graph
+
   @property
   def execution_cohord(self):
     return self.__execution_cohord
+
+  @staticmethod
+  def execution_cohords(blocks:List[Block]) -> List[Block]:
+    '''Flattens the execution cohords of the given blocks
+    into a single list in order.'''
+    return [
+      member for block in blocks
+      for member in block.execution_cohord]
       
   def __init_latches(self):
-    self._latches = {
-      name: Latch(block=self, port=port)
-      for name,port in self._ports.items()}
-    self._inputs = [
-      latch for latch in self.latches()
-      if latch.is_input]
-    self._outputs = [
-      latch for latch in self.latches()
-      if latch.is_output]
+    self._latches = dict()
+    self._inputs = list()
+    self._outputs = list()
+    # nodes given by Graph.build for the inputs of this block
+    graph = self.__graph
+    nodes = graph._attached
+    if nodes is not None and graph._attached_class is type(self):
+      graph._attached = None
+    else:
+      nodes = Block.__detached
+    for name,port in self._ports.items():
+      latch = Latch(block=self, port=port, node=nodes.get(name))
+      self._latches[name] = latch
+      if port._triggers:
+        self._inputs.append(latch)
+      elif port._output:
+        self._outputs.append(latch)
+    self._pending = len(self._inputs)
+    self._queued = False
 
   def _add_port(self, port_name, port_cls, **kwargs):
     '''This method is used when block ports need to be
     created dynamically'''
-    if hasattr(self, port_name):
+    if hasattr(self, port_name) or port_name in self._ports:
       raise Port.ConflictError(block=self)
     port = port_cls(**kwargs)
     port._name = port_name
     setattr(self, port_name, port)
+    if '_ports' not in self.__dict__:
+      # the ports of the class are shared by its instances
+      self._ports = dict(self._ports)
     self._ports[port_name] = port
-    self.__init_latches()
+    latch = Latch(block=self, port=port)
+    self._latches[port_name] = latch
+    if latch.is_trigger:
+      self._inputs.append(latch)
+      self._pending += 1
+    if latch.is_output:
+      self._outputs.append(latch)
+    self.__graph.invalidate()
       
   @property
   def name(self) -> str:
@@ -211,15 +618,65 @@ class Block(metaclass=BlockMeta):
     '''Block process specification'''
     pass
 
+  def get_executor(self) -> Union[Executor, str]:
+    '''Returns the resolved executor of the asynchronous
+    update process. See Executors.'''
+    executor = self.executor
+    if executor is None:
+      executor = self.__graph.executor
+    return Executors.get(executor)
+
   async def async_update(self):
     '''Asynchronous update process coroutine'''
     assert self.__loop, 'Block is not in an asynchronous loop'
+    executor = self.get_executor()
     async with self.__lock:
-      await self.__loop.run_in_executor(None, self.update)
+      if executor == Executors.INLINE:
+        self.update()
+      elif isinstance(executor, ProcessPoolExecutor):
+        await self.__remote_update(executor)
+      else:
+        await Block.__finish(self.__loop.run_in_executor(
+          executor, copy_context().run, self.update))
+
+  @staticmethod
+  async def __finish(future:asyncio.Future):
+    '''Awaits an update running in an executor. An update
+    cannot be interrupted once started, if the awaiting task is
+    cancelled the update is awaited to the end nevertheless so
+    that the lock of the block is held until it finished.'''
+    try:
+      return await asyncio.shield(future)
+    except asyncio.CancelledError:
+      while not future.done():
+        try:
+          await asyncio.wait([future])
+        except asyncio.CancelledError:
+          pass
+      raise
+
+  def _detached_state(self) -> dict:
+    '''Returns the block attributes excluding the runtime
+    attributes, for updating a detached copy of the block in
+    another process.'''
+    return {
+      key: value for key,value in self.__dict__.items()
+      if key not in Block.__runtime_attributes}
+
+  async def __remote_update(self, executor:Executor):
+    state = self._detached_state()
+    values = {
+      name: latch._node.value
+      for name,latch in self._latches.items()}
+    values, state = await Block.__finish(self.__loop.run_in_executor(
+      executor, remote_update, type(self), state, values))
+    self.__dict__.update(state)
+    for latch in self.outputs:
+      latch._node.value = values[latch._port._name]
     
   @staticmethod
-  def all():
-    return Block.__collection
+  def all(graph:Graph=None):
+    return (graph or Graph.current()).blocks()
 
   def latches(self):
     return self._latches.values()
@@ -245,59 +702,252 @@ class Block(metaclass=BlockMeta):
         latch.token = True
 
   @staticmethod
-  def get_execution_ready_blocks() -> List[Block]:
-    blocks = list()
-    for block in Block.all():
-      input_tokens = [inp.token for inp in block.inputs]
-      if (block.inputs and all(input_tokens)):
-        blocks.append(block)
-    return blocks
+  def get_execution_ready_blocks(graph:Graph=None) -> List[Block]:
+    '''Returns the blocks whose input latches all have a
+    token. Blocks are queued by their graph as their last
+    missing token arrives, hence no scan is required.'''
+    graph = graph or Graph.current()
+    return [block for block in graph._ready if block._pending == 0]
       
+  @staticmethod
+  def get_graph(*blocks:List[Block]) -> Graph:
+    '''Returns the common graph of the given blocks'''
+    graph = blocks[0].graph
+    assert all([b.graph is graph for b in blocks]), \
+      'Blocks must belong to the same graph'
+    return graph
+
+  @staticmethod
+  def compile(*start:List[Block]) -> Schedule:
+    '''Returns the precompiled execution Schedule of the
+    block system started from the given blocks.'''
+    return Schedule(*start)
+
   @staticmethod
   def execute(*start:List[Block]):
+    if len(start) == 1 and isinstance(start[0], Schedule):
+      return start[0].execute()
     assert start, \
       'At least one block must be specified as start block'
     assert all([isinstance(b, Block) for b in start]), \
       'Input must be a list of Block instances'
-    blocks = reduce(
-      lambda a,b: a+b, [b.execution_cohord for b in start], [])
+    graph = Block.get_graph(*start)
+    blocks = Block.execution_cohords(start)
+    profiler = Block.profiler
     try:
       while blocks:
-        Block.clear_input_latch_tokens(*blocks)
-        for block in blocks:
-          block.update()
-        Block.set_output_latch_tokens(*blocks)
-        ready_blocks = Block.get_execution_ready_blocks()
-        blocks = reduce(
-          lambda a,b: a+b,
-          [b.execution_cohord for b in ready_blocks], [])
+        if profiler is None:
+          Block.clear_input_latch_tokens(*blocks)
+          for block in blocks:
+            block.update()
+          Block.set_output_latch_tokens(*blocks)
+          ready_blocks = graph.pop_ready_blocks()
+        else:
+          ready_blocks = profiler.wave(
+            graph, blocks, ready=profiler.clock())
+        blocks = Block.execution_cohords(ready_blocks)
     except Block.Terminated:
       pass
     finally:
-      Block.clear_input_latch_tokens(*Block.all())
+      graph.clear_tokens()
       
   @staticmethod
-  async def async_execute(*start:List[Block]):
+  async def async_update_wave(blocks:List[Block],
+                              concurrent:bool=False,
+                              limit:int=None):
+    '''Runs the asynchronous update processes of a wave of
+    blocks. Blocks are updated one after the other unless
+    concurrent is set, in which case all updates are run as
+    concurrent tasks with at most limit of them running at
+    once (unlimited if None). The members of an execution
+    cohort, a block and its subblocks, are updated in order
+    within a single task. If any update fails the remaining
+    tasks are cancelled and the exception is propagated.'''
+    profiler = Block.profiler
+    if not concurrent:
+      for block in blocks:
+        if profiler is None:
+          await block.async_update()
+        else:
+          await profiler.async_update(block)
+      return
+    assert limit is None or limit > 0, \
+      'Concurrency limit must be a positive integer'
+    semaphore = asyncio.Semaphore(limit) if limit else None
+    async def update(cohord):
+      if semaphore is not None:
+        await semaphore.acquire()
+      try:
+        for block in cohord:
+          if profiler is None:
+            await block.async_update()
+          else:
+            await profiler.async_update(block)
+      finally:
+        if semaphore is not None:
+          semaphore.release()
+    members = set(blocks)
+    grouped = set()
+    cohords = list()
+    for block in blocks:
+      if block not in grouped:
+        cohord = [
+          member for member in block.execution_cohord
+          if member in members and member not in grouped]
+        grouped.update(cohord)
+        cohords.append(cohord)
+    tasks = [asyncio.ensure_future(update(c)) for c in cohords]
+    try:
+      await asyncio.gather(*tasks)
+    finally:
+      for task in tasks:
+        task.cancel()
+      await asyncio.gather(*tasks, return_exceptions=True)
+      
+  @staticmethod
+  async def async_execute(*start:List[Block],
+                          concurrent:bool=False,
+                          limit:int=None):
+    if len(start) == 1 and isinstance(start[0], Schedule):
+      return await start[0].async_execute(
+        concurrent=concurrent, limit=limit)
     assert start, \
       'At least one block must be specified as start block'
     assert all([isinstance(b, Block) for b in start]), \
       'Input must be a list of Block instances'
-    blocks = reduce(
-      lambda a,b: a+b, [b.execution_cohord for b in start], [])
+    graph = Block.get_graph(*start)
+    blocks = Block.execution_cohords(start)
     try:
       while blocks:
         Block.clear_input_latch_tokens(*blocks)
-        for block in blocks:
-          await block.async_update()
+        await Block.async_update_wave(
+          blocks, concurrent=concurrent, limit=limit)
         Block.set_output_latch_tokens(*blocks)
-        ready_blocks = Block.get_execution_ready_blocks()
-        blocks = reduce(
-          lambda a,b: a+b,
-          [b.execution_cohord for b in ready_blocks], [])
+        ready_blocks = graph.pop_ready_blocks()
+        blocks = Block.execution_cohords(ready_blocks)
     except Block.Terminated:
       pass
     finally:
-      Block.clear_input_latch_tokens(*Block.all())
+      graph.clear_tokens()
+
+
+class Schedule:
+  '''Schedule is a precompiled execution plan of a block
+  system. Since every executed block passes a token through
+  all of its outputs, the sequence of execution waves
+  started from a given set of blocks is fully determined by
+  the connectivity. Schedule simulates the token passing
+  mechanism once, using the precomputed fan-out of each
+  block, and records the resulting waves. Execution then
+  simply replays the recorded waves.
+
+  Feedback loops produce an infinite wave sequence which is
+  recorded as a finite prefix followed by a repeating
+  cycle.
+
+  Any change in the connectivity of the graph of the block
+  system invalidates its schedules, which are recompiled on
+  their next execution.'''
+
+  def __init__(self, *start:List[Block]):
+    assert start, \
+      'At least one block must be specified as start block'
+    assert all([isinstance(b, Block) for b in start]), \
+      'Input must be a list of Block instances'
+    self._start = start
+    self._graph = Block.get_graph(*start)
+    self.__compile()
+
+  @property
+  def graph(self) -> Graph:
+    return self._graph
+
+  @property
+  def is_outdated(self) -> bool:
+    return self.__compiled != self._graph._revision
+
+  @property
+  def waves(self) -> List[List[Block]]:
+    '''Execution waves preceding the repeating cycle'''
+    return self._waves[:self._cycle]
+
+  @property
+  def cycle(self) -> List[List[Block]]:
+    '''Repeating execution waves, empty when the block
+    system execution terminates.'''
+    return self._waves[self._cycle:]
+  
+  def __compile(self):
+    fanout = dict()
+    def get_fanout(block):
+      if block not in fanout:
+        fanout[block] = [
+          latch for output in block.outputs
+          for latch in output._node._inputs]
+      return fanout[block]
+    waves = list()
+    visited = dict()
+    tokens = dict()
+    blocks = Block.execution_cohords(self._start)
+    while blocks:
+      state = (tuple(blocks), frozenset(tokens))
+      if state in visited:
+        self._waves = waves
+        self._cycle = visited[state]
+        break
+      visited[state] = len(waves)
+      waves.append(tuple(blocks))
+      for block in blocks:
+        for latch in block.inputs:
+          tokens.pop(latch, None)
+      for block in blocks:
+        tokens.update(dict.fromkeys(get_fanout(block)))
+      candidates = dict.fromkeys(latch._block for latch in tokens)
+      ready_blocks = [
+        block for block in candidates
+        if all(latch in tokens for latch in block.inputs)]
+      blocks = Block.execution_cohords(ready_blocks)
+    else:
+      self._waves = waves
+      self._cycle = len(waves)
+    self.__compiled = self._graph._revision
+
+  def execute(self) -> bool:
+    '''Replays the schedule. Returns False if the execution
+    was terminated by a block.'''
+    if self.is_outdated:
+      self.__compile()
+    if Block.profiler is not None:
+      return Block.profiler.replay(self)
+    try:
+      for wave in self.waves:
+        for block in wave:
+          block.update()
+      cycle = self.cycle
+      while cycle:
+        for wave in cycle:
+          for block in wave:
+            block.update()
+    except Block.Terminated:
+      return False
+    return True
+
+  async def async_execute(self, concurrent:bool=False,
+                          limit:int=None):
+    if self.is_outdated:
+      self.__compile()
+    try:
+      for wave in self.waves:
+        await Block.async_update_wave(
+          wave, concurrent=concurrent, limit=limit)
+      cycle = self.cycle
+      while cycle:
+        for wave in cycle:
+          await Block.async_update_wave(
+            wave, concurrent=concurrent, limit=limit)
+    except Block.Terminated:
+      return False
+    return True
 
       
 class Latch:
@@ -309,11 +959,17 @@ class Latch:
       super().__init__(
         f"Latch {latch} is not a member of Node {node}")
 
-  def __init__(self, block:Block, port:Port):
+  __slots__ = ('_block', '_port', '_node', '_token', '_marked')
+
+  def __init__(self, block:Block, port:Port, node:Node=None):
     self._block = block
     self._port = port
-    self._node = Node(latch=self)
+    if node is None:
+      self._node = Node(latch=self)
+    else:
+      self._node = node._attach(self)
     self._token = False
+    self._marked = False
 
   def __str__(self):
     return "{}:{}".format(self._block, self._port)
@@ -329,6 +985,10 @@ class Latch:
   @property
   def is_input(self):
     return self._port.is_input
+
+  @property
+  def is_trigger(self):
+    return self._port.is_trigger
   
   @property
   def token(self):
@@ -336,12 +996,28 @@ class Latch:
 
   @token.setter
   def token(self, state:bool):
+    '''Setting the token of an input latch updates the count
+    of missing tokens of its block, which is queued for
+    execution when the count drops to zero. Setting the token
+    of an output latch sets the tokens of the connected input
+    latches.'''
     if self.is_input:
+      if self._token == state:
+        return
       self._token = state
+      block = self._block
+      if state:
+        if not self._marked:
+          self._marked = True
+          block.graph._mark(self)
+        block._pending -= 1
+        if block._pending == 0 and not block._queued:
+          block._queued = True
+          block.graph._enqueue(block)
+      else:
+        block._pending += 1
     else:
-      connected_input_latches = filter(
-        lambda l: l.is_input, self._node._latches)
-      for latch in connected_input_latches:
+      for latch in self._node._inputs:
         latch.token = state
         
   def detach(self):
@@ -358,8 +1034,6 @@ class Node:
 
   '''
 
-  __collection = set()
-
   class MergeError(Exception):
     def __init__(self, node1:Node, node2:Node):
       super().__init__(
@@ -371,16 +1045,25 @@ class Node:
       super().__init__(
         f"Attempting to set value before token is passed")
       
+  __slots__ = (
+    '_latches', '_inputs', '_value', '_graph',
+    '__name', '__is_driven', '__is_internal', '__weakref__')
+
   def __init__(self, latch:Latch, initial=None):
-    self._latches = set([latch])
-    self._value = initial or latch.initial
-    self._name = str(latch)
-    self.__is_driven = latch._port.is_output
-    self.__is_internal = latch._port.is_internal
-    Node.__collection.add(self)
+    port = latch._port
+    self._latches = {latch: None}
+    self._inputs = [latch] if port._triggers else []
+    self._value = initial if initial is not None else port._initial
+    self.__name = None
+    self.__is_driven = port._output
+    self.__is_internal = port._internal
+    self._graph = latch._block.graph
+    self._graph._add_node(self)
 
   def __str__(self):
-    return self._name
+    if self.__name is None:
+      self.__name = '|'.join([str(l) for l in self._latches])
+    return self.__name
     
   @property
   def value(self):
@@ -390,34 +1073,54 @@ class Node:
   def value(self, v):
     self._value = v
 
-  def __update_name(self):
-    self._name = '|'.join([str(l) for l in self._latches])
-  
-  def __merge(self, node:Node):
+  def _attach(self, latch:Latch) -> Node:
+    '''Adds an input latch without a node of its own to this
+    node'''
+    self._latches[latch] = None
+    if latch._port._triggers:
+      self._inputs.append(latch)
+    self.__name = None
+    return self
+
+  def _join(self, node:Node) -> Node:
+    '''Merges the node into this node without invalidating the
+    schedules of the graph'''
+    if node is self:
+      return self
     if self.__is_driven and node.__is_driven:
       raise Node.MergeError(node1=self, node2=node)
-    else:
-      self._latches |= node._latches
-      self.__is_driven |= node.__is_driven
-      if node.__is_driven:
-        self.value = node.value
-      for latch in node._latches:
-        latch._node = self
-      Node.__collection.remove(node)
-      self.__update_name()
-      return self
+    elif self._graph is not node._graph:
+      raise Graph.CrossingError(node1=self, node2=node)
+    self._latches.update(node._latches)
+    self._inputs += node._inputs
+    self.__is_driven |= node.__is_driven
+    if node.__is_driven:
+      self._value = node._value
+    for latch in node._latches:
+      latch._node = self
+    self._graph._remove_node(node)
+    self.__name = None
+    return self
+
+  def __merge(self, node:Node):
+    self._join(node)
+    self._graph.invalidate()
+    return self
 
   def __remove(self, latch:Latch):
     if latch in self._latches:
-      self._latches.remove(latch)
+      del self._latches[latch]
+      if latch.is_trigger:
+        self._inputs.remove(latch)
       latch._node = Node(
         latch=latch, initial=self.value)
+      self._graph.invalidate()
       if len(self._latches):
-        self.__update_name()
-        self.__is_driven = not latch.is_output
+        self.__name = None
+        self.__is_driven = self.__is_driven and not latch.is_output
         return self
       else:
-        Node.__collection.remove(self)
+        self._graph._remove_node(self)
         return None
     else:
       raise Latch.NotNodeMemberError(
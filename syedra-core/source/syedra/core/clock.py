@@ -0,0 +1,108 @@
+from __future__ import annotations
+import threading
+import time
+from contextvars import ContextVar
+
+
+__all__ = [
+  'Clock',
+  'WallClock',
+  'MonotonicClock',
+  'SimulatedClock',
+]
+
+
+class Clock:
+  '''Clock is the time base consulted by time dependent blocks
+  and the Scheduler. Blocks read the time of the current
+  clock, which is the innermost active clock scope or the
+  monotonic clock by default. Clock scopes are local to the
+  thread or asyncio task entering them.
+
+    with SimulatedClock() as clock:
+      ...
+
+  Child classes implement now() returning the time in
+  seconds.'''
+
+  __default = None
+  __scopes = ContextVar('clock_scopes', default=())
+
+  @staticmethod
+  def default() -> Clock:
+    if Clock.__default is None:
+      Clock.__default = MonotonicClock()
+    return Clock.__default
+
+  @staticmethod
+  def current() -> Clock:
+    '''Returns the innermost active clock scope'''
+    scopes = Clock.__scopes.get()
+    if scopes:
+      return scopes[-1]
+    return Clock.default()
+
+  def __enter__(self):
+    Clock.__scopes.set(Clock.__scopes.get() + (self,))
+    return self
+
+  def __exit__(self, *args):
+    scopes = Clock.__scopes.get()
+    assert scopes and scopes[-1] is self, \
+      'Clock scopes must be exited in reverse order'
+    Clock.__scopes.set(scopes[:-1])
+
+  def now(self) -> float:
+    raise NotImplementedError
+
+  def sleep_until(self, deadline:float,
+                  stopped:threading.Event=None):
+    '''Waits until the clock reaches the deadline or the
+    stopped event is set'''
+    delay = deadline - self.now()
+    if delay > 0:
+      if stopped is None:
+        time.sleep(delay)
+      else:
+        stopped.wait(delay)
+
+
+class WallClock(Clock):
+  '''Clock of the system time, which may jump when the system
+  time is adjusted'''
+
+  def now(self) -> float:
+    return time.time()
+
+
+class MonotonicClock(Clock):
+  '''Clock that never goes backwards, suited for measuring
+  time differences'''
+
+  def now(self) -> float:
+    return time.monotonic()
+
+
+class SimulatedClock(Clock):
+  '''Clock advanced explicitly rather than by the passage of
+  time. Sleeping until a deadline advances the clock to the
+  deadline at once, hence a Scheduler running on a simulated
+  clock executes its tasks in lockstep as fast as possible,
+  with reproducible time steps.'''
+
+  def __init__(self, start:float=0.0):
+    self.__time = start
+    self.__lock = threading.Lock()
+
+  def now(self) -> float:
+    return self.__time
+
+  def advance(self, duration:float):
+    assert duration >= 0, 'Clock cannot be advanced backwards'
+    with self.__lock:
+      self.__time += duration
+
+  def sleep_until(self, deadline:float,
+                  stopped:threading.Event=None):
+    with self.__lock:
+      self.__time = max(self.__time, deadline)
@@ -1,85 +1,209 @@
 from __future__ import annotations
-from typing import Callable, List, Tuple
+from enum import Enum
+from types import MethodType
+from typing import Callable, Dict, List, NamedTuple, Tuple, Type
+try:
+  import numpy as np
+except ImportError:
+  np = None
+from .block import Block
 
 
 __all__ = [
   'Machine',
   'State',
   'Event',
+  'MachineArray',
+  'MachineBlock',
 ]
 
 
 class State:
+  '''State of a machine. A state may contain machines, the
+  submachines of a hierarchical state or the orthogonal
+  regions of a parallel state if there are more than one.
+  The submachines are instantiated with the parent machine at
+  the first entry of the state, and are updated after the
+  during function only while the state is active. Exiting the
+  state resets them, hence they restart from their initial
+  states at the next entry.'''
 
   def __init__(self,
                ingress:Callable[[Machine], None]=None,
                during:Callable[[Machine], None]=None,
-               egress:Callable[[Machine], None]=None):
+               egress:Callable[[Machine], None]=None,
+               machines:List[Type[Machine]]=None):
     self._name = None
     self._machine = None
     self.__ingress = ingress
     self.__during = during
     self.__egress = egress
+    self.__machines = tuple(machines or ())
 
   def __str__(self):
     return self._name
+
+  @property
+  def machines(self) -> Tuple[Type[Machine]]:
+    return self.__machines
     
-  def ingress(self):
+  def ingress(self, machine:Machine=None):
     if callable(self.__ingress):
-      self.__ingress(self._machine)
+      self.__ingress(self._machine if machine is None else machine)
 
-  def during(self):
+  def during(self, machine:Machine=None):
     if callable(self.__during):
-      self.__during(self._machine)
+      self.__during(self._machine if machine is None else machine)
 
-  def egress(self):
+  def egress(self, machine:Machine=None):
     if callable(self.__egress):
-      self.__egress(self._machine)
-  
+      self.__egress(self._machine if machine is None else machine)
+
+  @property
+  def functions(self) -> Tuple[Callable[[Machine], None]]:
+    '''The ingress, during and egress functions, None for those
+    not specified'''
+    return tuple(
+      function if callable(function) else None
+      for function in (self.__ingress, self.__during, self.__egress))
+
+  def bind(self, machine:Machine) -> Tuple[Callable[[], None]]:
+    '''Returns the ingress, during and egress functions bound
+    to the machine, None for those not specified'''
+    return tuple(
+      None if function is None else MethodType(function, machine)
+      for function in self.functions)
+
 
 class Event:
+  '''Event guarding transitions. The inputs are the names of
+  the machine attributes the check depends on, which lets
+  event-driven machines skip the check until one of them
+  changes. An event without inputs is checked at every
+  update.'''
 
-  def __init__(self, check:Callable[[Machine], bool]=None):
+  def __init__(self, check:Callable[[Machine], bool]=None,
+               inputs:List[str]=None):
     self._name = None
     self._machine = None
     self.__check = check
+    self.__inputs = None if inputs is None else tuple(inputs)
 
   def __str__(self):
     return self._name
+
+  @property
+  def inputs(self) -> Tuple[str]:
+    return self.__inputs
   
-  def check(self) -> bool:
+  def check(self, machine:Machine=None) -> bool:
     if callable(self.__check):
-      return self.__check(self._machine)
+      return self.__check(self._machine if machine is None else machine)
     else:
       return False
 
+  def bind(self, machine:Machine) -> Callable[[], bool]:
+    '''Returns the check function bound to the machine, None if
+    not specified'''
+    if callable(self.__check):
+      return MethodType(self.__check, machine)
+    return None
+
   @property
   def is_occured(self) -> bool:
     return self.check()
 
   
+class _Input:
+  '''Descriptor of a plain machine attribute that is an event
+  input. Assignments notify the machine of the change. Having
+  no __get__, reads are served from the instance dictionary
+  as fast as those of any other attribute.'''
+
+  def __init__(self, name:str):
+    self.__name = name
+
+  def __set__(self, machine:Machine, value):
+    machine.__dict__[self.__name] = value
+    machine.notify(self.__name)
+
+
 class MachineMeta(type):
 
   def __new__(cls, name, bases, attrs):
     states = dict()
     events = dict()
-    for name,attr in attrs.items():
+    defaults = dict()
+    for base in reversed(bases):
+      states.update(getattr(base, '_states', {}))
+      events.update(getattr(base, '_events', {}))
+      defaults.update(getattr(base, '_defaults', {}))
+    for key,attr in attrs.items():
       if isinstance(attr, State):
-        attr._name = name
-        states[name] = attr
+        attr._name = key
+        states[key] = attr
       if isinstance(attr, Event):
-        attr._name = name
-        events[name] = attr
+        attr._name = key
+        events[key] = attr
+    masks = dict()
+    always = 0
+    for index,event in enumerate(events.values()):
+      if event.inputs is None:
+        always |= 1 << index
+      for input in event.inputs or ():
+        masks[input] = masks.get(input, 0) | 1 << index
+    for input in masks:
+      if input in attrs:
+        value = attrs[input]
+      elif input in defaults:
+        continue
+      else:
+        # inputs defined by the bases, such as properties
+        value = next((
+          vars(klass)[input] for base in bases
+          for klass in base.__mro__ if input in vars(klass)), None)
+      if not hasattr(value, '__get__'):
+        defaults[input] = value
+        attrs[input] = _Input(input)
     attrs['_states'] = states
     attrs['_events'] = events
+    attrs['_masks'] = masks
+    attrs['_always'] = always
+    attrs['_defaults'] = defaults
+    attrs['_table'] = None
     return super().__new__(cls, name, bases, attrs)
 
 
+class Table(NamedTuple):
+  '''Transition table of a machine class compiled to dense
+  indices. Each row lists the (event, target) index pairs of
+  the transitions from a state in the order of priority.'''
+  states:Tuple[State]
+  events:Tuple[Event]
+  index:Dict[str, int]
+  rows:Tuple[Tuple[Tuple[int, int]]]
+
+
 class Machine(metaclass=MachineMeta):
+  '''Finite state machine executing the transitions of its
+  class. In interpreted mode the transition table is walked
+  at every update. In compiled mode states and events are
+  indexed once per class and the callbacks are bound once per
+  instance. In event-driven mode, a compiled mode, an event
+  is checked only if its inputs changed since the previous
+  check, or the state has just been entered.'''
+
+  class Mode(Enum):
+    INTERPRETED = 'interpreted'
+    COMPILED = 'compiled'
+    EVENT_DRIVEN = 'event-driven'
 
   machine_name:str = None
   transitions:List[Tuple[str, str, str]] = []
   initial:str = None
+  machine_mode:Mode = Mode.INTERPRETED
+
+  __stale = -1
 
   class ImproperConfiguration(Exception):
 
@@ -87,21 +211,59 @@ class Machine(metaclass=MachineMeta):
       super().__init__(f"Improper configuration: {message}")
 
       
-  def __init__(self, name:str=None):
+  def __init__(self, name:str=None, mode:Mode=None,
+               parent:Machine=None, block:Block=None):
     self.__name = name or self.machine_name
+    if self.__name is None and parent is not None:
+      self.__name = f"{parent.name}.{type(self).__name__}"
     if self.__name is None:
       raise Machine.ImproperConfiguration(
         "A non empty string name must be assigned")
+    self.__parent = parent
+    self.__block = block
+    self.__regions = dict()
+    self.__mode = Machine.Mode(mode or self.machine_mode)
     for state in self._states.values():
       state._machine = self
     for event in self._events.values():
       event._machine = self
+    self.__dict__.update(
+      (input, value) for input,value in self._defaults.items()
+      if input not in self.__dict__)
     self._setup()
       
   @property
   def name(self) -> str:
     return self.__name
 
+  @property
+  def parent(self) -> Machine:
+    '''Machine of the state containing this machine, None for a
+    top level machine'''
+    return self.__parent
+
+  @property
+  def block(self) -> Block:
+    '''Block the machine belongs to, that of the parent machine
+    unless assigned'''
+    if self.__block is None and self.__parent is not None:
+      return self.__parent.block
+    return self.__block
+
+  @block.setter
+  def block(self, block:Block):
+    self.__block = block
+
+  @property
+  def current_state(self) -> str:
+    '''Name of the current state, None before the first
+    update'''
+    if self.__mode == Machine.Mode.INTERPRETED:
+      return None if self.__current is None else self.__current._name
+    if self.__index is None:
+      return None
+    return self.__table.states[self.__index]._name
+
   def __str__(self):
     return self.name
 
@@ -114,9 +276,31 @@ class Machine(metaclass=MachineMeta):
     else:
       raise Machine.ImproperConfiguration(
         f"Specified initial state ({self.initial}) is not a machine state")
-      
+
+  @classmethod
+  def compile(cls) -> Table:
+    '''Returns the transition table of the class compiled to
+    dense indices, compiled once per class'''
+    if cls.__dict__['_table'] is None:
+      states = tuple(cls._states.values())
+      events = tuple(cls._events.values())
+      index = {state._name: i for i,state in enumerate(states)}
+      event_index = {event._name: i for i,event in enumerate(events)}
+      rows = [dict() for _ in states]
+      for source,event,target in cls.transitions:
+        rows[index[source]][event_index[event]] = index[target]
+      cls._table = Table(
+        states=states, events=events, index=index,
+        rows=tuple(tuple(row.items()) for row in rows))
+    return cls._table
+
   def _setup(self):
     self.__transitions = dict()
+    self.__stale = -1
+    self.__step = self.__update_interpreted
+    if self.__mode != Machine.Mode.INTERPRETED:
+      self.__bind()
+      return
     for transition in self.transitions:
       source = self._states[transition[0]]
       event = self._events[transition[1]]
@@ -127,8 +311,100 @@ class Machine(metaclass=MachineMeta):
         self.__transitions[source] = {event: target}
     self.__initial = self._states[self.get_initial()]
     self.__current = None
+
+  def __bind(self):
+    table = self.compile()
+    checks = [event.bind(self) for event in table.events]
+    bound = [state.bind(self) for state in table.states]
+    self.__ingress = tuple(functions[0] for functions in bound)
+    self.__during = tuple(functions[1] for functions in bound)
+    self.__egress = tuple(functions[2] for functions in bound)
+    self.__rows = tuple(
+      tuple((checks[event], target, 1 << event)
+            for event,target in row if checks[event] is not None)
+      for row in table.rows)
+    self.__row_masks = tuple(
+      sum(mask for _,_,mask in row) for row in self.__rows)
+    for index,state in enumerate(table.states):
+      if state.machines:
+        self.__during = self.__during[:index] + (
+          self.__nest_during(state, self.__during[index]),
+        ) + self.__during[index+1:]
+        self.__egress = self.__egress[:index] + (
+          self.__nest_egress(state, self.__egress[index]),
+        ) + self.__egress[index+1:]
+    self.__table = table
+    self.__initial = table.index[self.get_initial()]
+    self.__index = None
+    self.__step = (
+      self.__update_event_driven
+      if self.__mode == Machine.Mode.EVENT_DRIVEN
+      else self.__update_compiled)
+    if type(self).update is Machine.update:
+      # skips the dispatch of update() unless overridden
+      self.update = self.__step
+
+  def regions(self, state:State) -> Tuple[Machine]:
+    '''Returns the submachines of the state, instantiated at the
+    first call'''
+    regions = self.__regions.get(state)
+    if regions is None:
+      regions = tuple(
+        machine(parent=self) for machine in state.machines)
+      self.__regions[state] = regions
+    return regions
+
+  def __nest_during(self, state:State,
+                    during:Callable[[], None]) -> Callable[[], None]:
+    regions = self.regions
+    def nested():
+      if during is not None:
+        during()
+      for region in regions(state):
+        region.update()
+    return nested
+
+  def __nest_egress(self, state:State,
+                    egress:Callable[[], None]) -> Callable[[], None]:
+    regions = self.__regions
+    def nested():
+      for region in regions.get(state, ()):
+        region.reset()
+      if egress is not None:
+        egress()
+    return nested
+
+  def reset(self):
+    '''Exits the current state, the submachines first, and
+    returns before the initial state, which is entered at the
+    next update'''
+    if self.__mode == Machine.Mode.INTERPRETED:
+      if self.__current is not None:
+        self.__exit(self.__current)
+        self.__current = None
+    elif self.__index is not None:
+      egress = self.__egress[self.__index]
+      if egress is not None:
+        egress()
+      self.__index = None
+    self.__stale = -1
+
+  def notify(self, *inputs:str):
+    '''Marks the inputs as changed, hence the events depending
+    on them are checked at the next update. Assignments to
+    inputs that are plain attributes notify implicitly.'''
+    for input in inputs:
+      self.__stale |= self._masks.get(input, 0)
       
   def print(self):
+    if self.__mode != Machine.Mode.INTERPRETED:
+      table = self.__table
+      print("-> {}".format(table.states[self.__initial]))
+      for source,row in zip(table.states, table.rows):
+        for event,target in row:
+          print("({})-|{}|->({})".format(
+            source, table.events[event], table.states[target]))
+      return
     print("-> {}".format(self.__initial))
     for source,transitions in self.__transitions.items():
       for event,target in transitions.items():
@@ -136,17 +412,290 @@ class Machine(metaclass=MachineMeta):
           source, event, target))
 
   def update(self):
+    self.__step()
+
+  def __update_interpreted(self):
     if self.__current is None:
       self.__current = self.__initial
-      self.__current.ingress()
+      self.__current.ingress(self)
     else:
-      transitions = self.__transitions[self.__current]
+      transitions = self.__transitions.get(self.__current, {})
       for event,target in transitions.items():
-        if event.is_occured:
-          self.__current.egress()
+        if event.check(self):
+          self.__exit(self.__current)
           self.__current = target
-          self.__current.ingress()
+          self.__current.ingress(self)
           break
-    self.__current.during()
-        
+    self.__current.during(self)
+    if self.__current.machines:
+      for region in self.regions(self.__current):
+        region.update()
+
+  def __exit(self, state:State):
+    for region in self.__regions.get(state, ()):
+      region.reset()
+    state.egress(self)
+
+  def __enter(self, source:int, target:int) -> int:
+    if source is not None:
+      egress = self.__egress[source]
+      if egress is not None:
+        egress()
+    self.__index = target
+    ingress = self.__ingress[target]
+    if ingress is not None:
+      ingress()
+    self.__stale = -1
+    return target
+
+  def __update_compiled(self):
+    current = self.__index
+    if current is None:
+      current = self.__enter(None, self.__initial)
+    else:
+      for check,target,_ in self.__rows[current]:
+        if check():
+          current = self.__enter(current, target)
+          break
+    during = self.__during[current]
+    if during is not None:
+      during()
+
+  def __update_event_driven(self):
+    current = self.__index
+    if current is None:
+      current = self.__enter(None, self.__initial)
+    else:
+      stale = self.__stale
+      self.__stale = self._always
+      if stale & self.__row_masks[current]:
+        for check,target,mask in self.__rows[current]:
+          if stale & mask and check():
+            current = self.__enter(current, target)
+            break
+    during = self.__during[current]
+    if during is not None:
+      during()
+
 
+class MachineArray:
+  '''MachineArray steps a population of identical machines of
+  a Machine class at once. The current states are an integer
+  array of indices into the compiled table of the class and
+  the machine data are arrays with one entry per machine,
+  assigned as attributes of the array.
+
+    array = MachineArray(Follower, size=100000)
+    array.distance = distances
+    array.update()
+
+  Event checks are evaluated once per update over the whole
+  population, hence they must be vectorized: given the array
+  they return a boolean array, or a boolean applying to all
+  machines. State functions are called once per state with a
+  View of the machines in the state, whose attributes are the
+  data entries of those machines. Scalar data, including the
+  defaults of the machine class, is broadcast to all machines
+  as float arrays for integers and with the type of the value
+  otherwise.
+
+  Requires NumPy.'''
+
+  class View:
+    '''Selection of the machines of an array. Reading a data
+    attribute returns the entries of the selected machines and
+    assigning one sets them. Other attributes are those of the
+    machine class, methods being bound to the view.'''
+
+    def __init__(self, array:MachineArray, indices:np.ndarray):
+      object.__setattr__(self, '_View__array', array)
+      object.__setattr__(self, '_View__indices', indices)
+
+    @property
+    def indices(self) -> np.ndarray:
+      return self.__indices
+
+    def __len__(self):
+      return len(self.__indices)
+
+    def __getattr__(self, name:str):
+      data = self.__array.data
+      if name in data:
+        return data[name][self.__indices]
+      attr = getattr(self.__array.machine_class, name)
+      if callable(attr) and hasattr(attr, '__get__'):
+        return MethodType(attr, self)
+      return attr
+
+    def __setattr__(self, name:str, value):
+      data = self.__array.data
+      if name not in data:
+        raise AttributeError(
+          f"{name} is not a data attribute of {self.__array}")
+      data[name][self.__indices] = value
+
+
+  def __init__(self, machine_class:type, size:int,
+               name:str=None):
+    if np is None:
+      raise ImportError('MachineArray requires NumPy')
+    assert size > 0, 'Size must be a positive integer'
+    object.__setattr__(self, '_MachineArray__data', dict())
+    self.__class = machine_class
+    self.__size = size
+    self.__name = name or machine_class.machine_name
+    self.__table = machine_class.compile()
+    initial = machine_class.initial
+    if initial not in self.__table.index:
+      raise Machine.ImproperConfiguration(
+        f"Specified initial state ({initial}) is not a machine state")
+    self.__initial = self.__table.index[initial]
+    if any(state.machines for state in self.__table.states):
+      raise Machine.ImproperConfiguration(
+        "States with submachines cannot be vectorized")
+    self.__states = None
+    self.__checks = tuple(
+      event.bind(self) for event in self.__table.events)
+    functions = [state.functions for state in self.__table.states]
+    self.__ingress = tuple(function[0] for function in functions)
+    self.__during = tuple(function[1] for function in functions)
+    self.__egress = tuple(function[2] for function in functions)
+    for input,value in machine_class._defaults.items():
+      if value is not None:
+        setattr(self, input, value)
+
+  def __setattr__(self, name:str, value):
+    if name.startswith('_'):
+      object.__setattr__(self, name, value)
+      return
+    if np.ndim(value) == 0:
+      # integer scalars such as a default of 0 are widened so
+      # that fractional values can be assigned to the entries
+      dtype = float if type(value) is int else None
+      value = np.full(self.__size, value, dtype=dtype)
+    else:
+      value = np.array(value)
+      assert len(value) == self.__size, \
+        f"Data of {name} must have {self.__size} entries"
+    self.__data[name] = value
+
+  def __getattr__(self, name:str):
+    data = self.__dict__.get('_MachineArray__data', {})
+    if name in data:
+      return data[name]
+    if name.startswith('_'):
+      raise AttributeError(name)
+    attr = getattr(self.__class, name)
+    if callable(attr) and hasattr(attr, '__get__'):
+      return MethodType(attr, self)
+    return attr
+
+  def __len__(self):
+    return self.__size
+
+  def __str__(self):
+    return self.__name
+
+  @property
+  def name(self) -> str:
+    return self.__name
+
+  @property
+  def machine_class(self) -> type:
+    return self.__class
+
+  @property
+  def data(self) -> Dict[str, np.ndarray]:
+    return self.__data
+
+  @property
+  def states(self) -> np.ndarray:
+    '''State indices of the machines in the compiled table of
+    the machine class, None before the first update'''
+    return self.__states
+
+  def count(self, state:str) -> int:
+    '''Returns the number of machines in the state'''
+    if self.__states is None:
+      return 0
+    return int(np.count_nonzero(
+      self.__states == self.__table.index[state]))
+
+  def __call(self, functions:Tuple[Callable[[View], None]],
+             states:np.ndarray, selected:np.ndarray=None):
+    if not any(functions):
+      return
+    present = np.bincount(
+      states if selected is None else states[selected],
+      minlength=len(functions))
+    for state in np.flatnonzero(present):
+      function = functions[state]
+      if function is not None:
+        members = states == state
+        if selected is not None:
+          members &= selected
+        function(MachineArray.View(self, np.flatnonzero(members)))
+
+  def update(self):
+    states = self.__states
+    if states is None:
+      states = np.full(self.__size, self.__initial, dtype=np.intp)
+      self.__states = states
+      self.__call(self.__ingress, states)
+    else:
+      targets = states.copy()
+      # self transitions leave the state index unchanged but
+      # still exit and enter the state
+      fired = np.zeros(self.__size, dtype=bool)
+      results = dict()
+      present = np.bincount(states, minlength=len(self.__table.states))
+      for state in np.flatnonzero(present):
+        members = None
+        # lower priority first, the first occuring event wins
+        for event,target in reversed(self.__table.rows[state]):
+          check = self.__checks[event]
+          if check is None:
+            continue
+          if event not in results:
+            results[event] = np.broadcast_to(
+              np.asarray(check(), dtype=bool), (self.__size,))
+          if members is None:
+            members = states == state
+          taken = members & results[event]
+          targets[taken] = target
+          fired |= taken
+      if fired.any():
+        self.__call(self.__egress, states, fired)
+        self.__states = states = targets
+        self.__call(self.__ingress, states, fired)
+    self.__call(self.__during, states)
+
+
+class MachineBlock(Block):
+  '''MachineBlock updates state machines, the orthogonal
+  regions of the block, at every block update. The machines
+  are instantiated with the block, which they access through
+  their block property, e.g. to read the ports.
+
+    class Supervisor(MachineBlock):
+      block_name = 'Supervisor'
+      machines = [Motion, Lights]
+
+      gauge = InputPort(initial=0)'''
+
+  machines:List[Type[Machine]] = []
+
+  def __init__(self, machines:List[Type[Machine]]=None,
+               name:str=None, **kwargs):
+    super().__init__(name=name, **kwargs)
+    self.__regions = tuple(
+      machine(block=self)
+      for machine in (self.machines if machines is None else machines))
+
+  @property
+  def regions(self) -> Tuple[Machine]:
+    return self.__regions
+
+  def update(self):
+    for region in self.__regions:
+      region.update()
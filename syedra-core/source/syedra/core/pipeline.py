@@ -0,0 +1,327 @@
+from __future__ import annotations
+import threading
+from collections import deque
+from contextvars import copy_context
+from enum import Enum
+from typing import List
+from .block import Block, Schedule
+
+
+__all__ = [
+  'Pipeline',
+  'Channel',
+]
+
+
+class Channel:
+  '''Channel is a bounded first-in-first-out queue passing
+  packets between the stages of a Pipeline. When the channel
+  is full the put behavior is determined by the policy.'''
+
+  class Policy(Enum):
+    BLOCK = 'block'
+    DROP_OLDEST = 'drop-oldest'
+    DROP_NEWEST = 'drop-newest'
+
+  class Closed(Exception):
+    def __init__(self):
+      super().__init__("Channel is closed")
+
+  def __init__(self, depth:int=1, policy:Policy=Policy.BLOCK):
+    assert depth > 0, 'Channel depth must be a positive integer'
+    self.__depth = depth
+    self.__policy = Channel.Policy(policy)
+    self.__items = deque()
+    self.__condition = threading.Condition()
+    self.__closed = False
+    self.dropped = 0
+
+  @property
+  def depth(self) -> int:
+    return self.__depth
+
+  @property
+  def policy(self) -> Policy:
+    return self.__policy
+
+  def __len__(self):
+    return len(self.__items)
+
+  def put(self, item, force:bool=False):
+    '''Puts the item into the channel. A forced put ignores
+    the depth limit.'''
+    with self.__condition:
+      if self.__closed:
+        raise Channel.Closed()
+      if not force and len(self.__items) >= self.__depth:
+        if self.__policy == Channel.Policy.DROP_NEWEST:
+          self.dropped += 1
+          return
+        elif self.__policy == Channel.Policy.DROP_OLDEST:
+          self.__items.popleft()
+          self.dropped += 1
+        else:
+          while (len(self.__items) >= self.__depth and
+                 not self.__closed):
+            self.__condition.wait()
+          if self.__closed:
+            raise Channel.Closed()
+      self.__items.append(item)
+      self.__condition.notify_all()
+
+  def get(self):
+    with self.__condition:
+      while not self.__items and not self.__closed:
+        self.__condition.wait()
+      if self.__closed:
+        raise Channel.Closed()
+      item = self.__items.popleft()
+      self.__condition.notify_all()
+      return item
+
+  def close(self):
+    with self.__condition:
+      self.__closed = True
+      self.__condition.notify_all()
+
+
+class Pipeline:
+  '''Pipeline executes a block system as a sequence of stages
+  each running in its own thread, such that a stage works on
+  frame N while the preceding stage works on frame N+1. The
+  stages are connected with bounded Channels. The execution
+  order within a stage is taken from the compiled Schedule
+  of the block system, hence block system must not contain
+  feedback loops.
+
+  Stages are specified as lists of blocks. Blocks that are
+  not listed join the latest stage of the blocks they depend
+  on. If no stages are specified each execution wave of the
+  schedule becomes a stage.
+
+  The input latches of the blocks that consume values
+  produced in earlier stages are detached from their nodes
+  while the pipeline is running. These values are carried
+  along the stages in packets instead, so that the blocks
+  are not modified. Connectivity is restored on close.'''
+
+  Policy = Channel.Policy
+
+  class CyclicError(Exception):
+    def __init__(self, schedule:Schedule):
+      super().__init__(
+        "Block system with feedback loops cannot be pipelined")
+
+  class StageError(Exception):
+    def __init__(self, block:Block):
+      super().__init__(
+        f"Block {block} is assigned to a stage preceding "
+        "its dependencies")
+
+  __END = object()
+
+  def __init__(self, *start:List[Block],
+               stages:List[List[Block]]=None,
+               depth:int=1,
+               policy:Channel.Policy=Channel.Policy.BLOCK):
+    schedule = Block.compile(*start)
+    if schedule.cycle:
+      raise Pipeline.CyclicError(schedule=schedule)
+    order = [block for wave in schedule.waves for block in wave]
+    if stages is None:
+      stages = schedule.waves
+    self.__stages = Pipeline._partition(order, stages)
+    self.__depth = depth
+    self.__policy = policy
+    self.__channels = self.__connect()
+    self.__boundaries = None
+    self.__threads = list()
+    self.__exception = None
+    self.__stopped = threading.Event()
+    self.__closed = False
+
+  @property
+  def stages(self) -> List[List[Block]]:
+    return self.__stages
+
+  @property
+  def channels(self) -> List[Channel]:
+    return self.__channels
+
+  @property
+  def dropped(self) -> int:
+    '''Total number of packets dropped by the channels'''
+    return sum([channel.dropped for channel in self.__channels])
+
+  def __connect(self) -> List[Channel]:
+    return [
+      Channel(depth=self.__depth, policy=self.__policy)
+      for _ in self.__stages[1:]]
+
+  @staticmethod
+  def _partition(order:List[Block],
+                 stages:List[List[Block]]) -> List[List[Block]]:
+    '''Assigns the blocks given in execution order to stages,
+    blocks that are not listed join the latest stage of the
+    blocks they depend on.'''
+    assigned = dict()
+    for index,stage in enumerate(stages):
+      for block in stage:
+        assigned[block] = index
+    producers = dict()
+    for block in order:
+      for latch in block.outputs:
+        producers[latch._node] = block
+    stage_of = dict()
+    for block in order:
+      dependencies = [
+        stage_of[producers[latch._node]]
+        for latch in block.latches()
+        if latch.is_input and latch._node in producers
+        and producers[latch._node] in stage_of]
+      latest = max(dependencies, default=0)
+      index = assigned.get(block, latest)
+      if index < latest:
+        raise Pipeline.StageError(block=block)
+      stage_of.setdefault(block, index)
+    partition = [list() for _ in stages]
+    for block in order:
+      partition[stage_of[block]].append(block)
+    return [stage for stage in partition if stage]
+
+  def __detach(self):
+    stage_of = dict()
+    for index,stage in enumerate(self.__stages):
+      for block in stage:
+        stage_of.setdefault(block, index)
+    producers = dict()
+    for block in stage_of:
+      for latch in block.outputs:
+        producers[latch._node] = block
+    boundaries = [list() for _ in self.__stages]
+    for index,stage in enumerate(self.__stages):
+      latches = dict.fromkeys(
+        latch for block in stage for latch in block.latches()
+        if latch.is_input)
+      for latch in latches:
+        node = latch._node
+        if (node in producers and
+            stage_of[producers[node]] < index):
+          latch.detach()
+          boundaries[index].append((latch, node))
+    return boundaries
+
+  def __attach(self):
+    for boundaries in self.__boundaries:
+      for latch,node in boundaries:
+        node >> latch._node
+    self.__boundaries = None
+
+  def __run_stage(self, index:int, count:int):
+    stage = self.__stages[index]
+    boundaries = self.__boundaries[index]
+    produced = [
+      latch._node for block in stage for latch in block.outputs]
+    source = self.__channels[index-1] if index else None
+    sink = (self.__channels[index]
+            if index < len(self.__channels) else None)
+    iteration = 0
+    try:
+      while not self.__stopped.is_set():
+        if source is None:
+          if count is not None and iteration >= count:
+            packet = Pipeline.__END
+          else:
+            packet = dict()
+          iteration += 1
+        else:
+          packet = source.get()
+        if packet is Pipeline.__END:
+          if sink is not None:
+            sink.put(packet, force=True)
+          return
+        for latch,node in boundaries:
+          latch._node.value = packet[node]
+        profiler = Block.profiler
+        for block in stage:
+          if profiler is None:
+            block.update()
+          else:
+            profiler.update(block)
+        if sink is not None:
+          for node in produced:
+            packet[node] = node.value
+          sink.put(packet)
+    except Channel.Closed:
+      pass
+    except Block.Terminated:
+      self.stop()
+    except BaseException as exception:
+      if self.__exception is None:
+        self.__exception = exception
+      self.stop()
+
+  def start(self, count:int=None):
+    '''Starts the stage threads. The first stage is executed
+    count times, or until the pipeline is stopped if None.
+    The boundary latches are detached until the pipeline is
+    closed. A finished pipeline can be started again until it
+    is closed, each start connects the stages with new
+    channels.'''
+    assert not self.__closed, 'Pipeline is closed'
+    assert not self.__threads, 'Pipeline is already running'
+    self.__channels = self.__connect()
+    if self.__boundaries is None:
+      self.__boundaries = self.__detach()
+    self.__stopped.clear()
+    self.__exception = None
+    # the stages see the clock scopes active at start
+    self.__threads = [
+      threading.Thread(
+        target=copy_context().run,
+        args=(self.__run_stage, index, count),
+        name=f"Pipeline Stage {index}", daemon=True)
+      for index in range(len(self.__stages))]
+    for thread in self.__threads:
+      thread.start()
+
+  def stop(self):
+    self.__stopped.set()
+    for channel in self.__channels:
+      channel.close()
+
+  def join(self, poll:float=0.1):
+    '''Waits for the stage threads to finish and raises the
+    first exception raised by a stage if any.'''
+    try:
+      for thread in self.__threads:
+        while thread.is_alive():
+          thread.join(timeout=poll)
+    except BaseException:
+      self.stop()
+      raise
+    self.__threads = list()
+    if self.__exception is not None:
+      raise self.__exception
+
+  def close(self):
+    '''Stops the pipeline and restores the connectivity of the
+    block system'''
+    self.stop()
+    for thread in self.__threads:
+      thread.join()
+    self.__threads = list()
+    if self.__boundaries is not None:
+      self.__attach()
+    self.__closed = True
+
+  def run(self, count:int=None):
+    '''Runs the pipeline until the first stage has been
+    executed count times, a block terminates the execution
+    or an exception occurs. The pipeline is closed
+    afterwards.'''
+    try:
+      self.start(count=count)
+      self.join()
+    finally:
+      self.close()
@@ -0,0 +1,260 @@
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import List, TextIO
+from .block import Block, Graph, Schedule
+
+
+__all__ = [
+  'Profiler',
+]
+
+
+class Record:
+  '''Record accumulates the timing samples of a profiled
+  entity. Counts and totals are exact while percentiles are
+  computed over the most recent samples.'''
+
+  def __init__(self, name:str, capacity:int):
+    self.name = name
+    self.calls = 0
+    self.total = 0.0
+    self.maximum = 0.0
+    self.samples = deque(maxlen=capacity)
+    self.delays = deque(maxlen=capacity)
+
+  def add(self, duration:float, delay:float=None):
+    self.calls += 1
+    self.total += duration
+    self.maximum = max(self.maximum, duration)
+    self.samples.append(duration)
+    if delay is not None:
+      self.delays.append(delay)
+
+  @staticmethod
+  def percentiles(samples) -> dict:
+    ordered = sorted(samples)
+    if not ordered:
+      return {'p50': None, 'p90': None, 'p99': None}
+    def rank(p):
+      index = min(int(p * len(ordered)), len(ordered) - 1)
+      return ordered[index]
+    return {
+      'p50': rank(0.50),
+      'p90': rank(0.90),
+      'p99': rank(0.99),
+    }
+
+  def snapshot(self) -> dict:
+    return {
+      'name': self.name,
+      'calls': self.calls,
+      'total': self.total,
+      'mean': self.total / self.calls if self.calls else None,
+      'max': self.maximum,
+      'latency': Record.percentiles(self.samples),
+      'queueing': Record.percentiles(self.delays),
+    }
+
+
+class Profiler:
+  '''Profiler measures where the execution time of block
+  systems goes. While enabled it records for each block the
+  number of update calls, the update latency and the
+  queueing delay between the block becoming ready and its
+  update being started. The scheduler phases of the token
+  based execution are recorded as well:
+
+    - clear : clearing the input tokens of a wave
+    - dispatch : updating the blocks of a wave
+    - ready : passing output tokens and collecting the blocks
+      ready for the next wave
+
+  Profiling is opt-in, when no profiler is enabled the
+  execution only pays for an attribute check per wave and
+  per queued block.
+  Timing events can be exported in the Chrome trace format
+  which can be inspected with chrome://tracing or Perfetto.'''
+
+  PHASES = ('clear', 'dispatch', 'ready')
+
+  clock = staticmethod(time.perf_counter)
+
+  def __init__(self, capacity:int=10000, trace:bool=False):
+    '''capacity: number of recent samples kept per block for
+    percentiles and trace events.
+    trace: records timing events for trace export if set.'''
+    self.__capacity = capacity
+    self.__trace = deque(maxlen=capacity) if trace else None
+    self.__lock = threading.Lock()
+    self.__origin = self.clock()
+    self.clear()
+
+  def clear(self):
+    with self.__lock:
+      self.__blocks = dict()
+      self.__phases = {
+        phase: Record(name=phase, capacity=self.__capacity)
+        for phase in Profiler.PHASES}
+      if self.__trace is not None:
+        self.__trace.clear()
+
+  @property
+  def is_enabled(self) -> bool:
+    return Block.profiler is self
+
+  def enable(self):
+    Block.profiler = self
+
+  def disable(self):
+    if Block.profiler is self:
+      Block.profiler = None
+
+  def __enter__(self):
+    self.enable()
+    return self
+
+  def __exit__(self, *args):
+    self.disable()
+
+  def __event(self, name:str, category:str,
+              start:float, end:float):
+    if self.__trace is not None:
+      self.__trace.append((
+        name, category, start, end, threading.get_ident()))
+
+  def record_block(self, block:Block, start:float, end:float,
+                   ready:float=None):
+    with self.__lock:
+      record = self.__blocks.get(block)
+      if record is None:
+        record = Record(name=block.name, capacity=self.__capacity)
+        self.__blocks[block] = record
+      record.add(
+        end - start, None if ready is None else start - ready)
+      self.__event(block.name, 'block', start, end)
+
+  def record_phase(self, phase:str, start:float, end:float):
+    with self.__lock:
+      self.__phases[phase].add(end - start)
+      self.__event(phase, 'phase', start, end)
+
+  @staticmethod
+  def __queued(block:Block, ready:float) -> float:
+    '''Returns the time the block was queued for execution
+    in its graph, or ready if it was not queued'''
+    queued = block._ready_at
+    if queued is None:
+      return ready
+    block._ready_at = None
+    return queued
+
+  def update(self, block:Block, ready:float=None):
+    '''Updates the block recording its latency'''
+    ready = Profiler.__queued(block, ready)
+    start = self.clock()
+    try:
+      block.update()
+    finally:
+      self.record_block(block, start, self.clock(), ready)
+
+  async def async_update(self, block:Block, ready:float=None):
+    '''Asynchronously updates the block recording its
+    latency'''
+    ready = Profiler.__queued(block, ready)
+    start = self.clock()
+    try:
+      await block.async_update()
+    finally:
+      self.record_block(block, start, self.clock(), ready)
+
+  def wave(self, graph:Graph, blocks:List[Block],
+           ready:float) -> List[Block]:
+    '''Executes a wave of the token based execution and
+    returns the blocks ready for the next wave. The queueing
+    delay of the blocks that were not queued, such as the
+    start blocks, is measured from ready.'''
+    start = self.clock()
+    Block.clear_input_latch_tokens(*blocks)
+    dispatch = self.clock()
+    self.record_phase('clear', start, dispatch)
+    try:
+      for block in blocks:
+        self.update(block, ready=ready)
+    finally:
+      end = self.clock()
+      self.record_phase('dispatch', dispatch, end)
+    Block.set_output_latch_tokens(*blocks)
+    ready_blocks = graph.pop_ready_blocks()
+    self.record_phase('ready', end, self.clock())
+    return ready_blocks
+
+  def replay(self, schedule:Schedule) -> bool:
+    '''Replays a compiled schedule recording the block
+    latencies. Returns False if the execution was terminated
+    by a block.'''
+    def dispatch(wave):
+      start = self.clock()
+      try:
+        for block in wave:
+          self.update(block, ready=start)
+      finally:
+        self.record_phase('dispatch', start, self.clock())
+    try:
+      for wave in schedule.waves:
+        dispatch(wave)
+      cycle = schedule.cycle
+      while cycle:
+        for wave in cycle:
+          dispatch(wave)
+    except Block.Terminated:
+      return False
+    return True
+
+  def snapshot(self) -> dict:
+    '''Returns the recorded statistics with the blocks sorted
+    by their total update time in descending order. Times are
+    in seconds.'''
+    with self.__lock:
+      blocks = [
+        record.snapshot() for record in self.__blocks.values()]
+      phases = {
+        name: record.snapshot()
+        for name,record in self.__phases.items()}
+    blocks.sort(key=lambda b: b['total'], reverse=True)
+    return {'blocks': blocks, 'phases': phases}
+
+  def trace(self) -> dict:
+    '''Returns the recorded events in the Chrome trace event
+    format'''
+    assert self.__trace is not None, \
+      'Profiler is not recording trace events'
+    pid = os.getpid()
+    with self.__lock:
+      events = list(self.__trace)
+    return {
+      'traceEvents': [
+        {
+          'name': name,
+          'cat': category,
+          'ph': 'X',
+          'ts': (start - self.__origin) * 1e6,
+          'dur': (end - start) * 1e6,
+          'pid': pid,
+          'tid': tid,
+        }
+        for name,category,start,end,tid in events],
+      'displayTimeUnit': 'ms',
+    }
+
+  def export_trace(self, file:TextIO):
+    '''Writes the Chrome trace JSON to the given file object
+    or file path'''
+    if isinstance(file, (str, os.PathLike)):
+      with open(file, 'w') as f:
+        json.dump(self.trace(), f)
+    else:
+      json.dump(self.trace(), file)
@@ -0,0 +1,240 @@
+from __future__ import annotations
+import threading
+from bisect import bisect_right
+from typing import List
+from .block import Block, Schedule
+from .clock import Clock
+
+
+__all__ = [
+  'Scheduler',
+  'Task',
+  'Histogram',
+]
+
+
+class Histogram:
+  '''Histogram counts samples in bins delimited by the given
+  ascending edges. Samples below the first edge are counted
+  in the first bin and samples above the last edge in the
+  last bin.'''
+
+  def __init__(self, edges:List[float]):
+    assert list(edges) == sorted(edges), \
+      'Histogram edges must be in ascending order'
+    self.__edges = list(edges)
+    self.__counts = [0] * (len(self.__edges) + 1)
+
+  @property
+  def edges(self) -> List[float]:
+    return self.__edges
+
+  @property
+  def counts(self) -> List[int]:
+    return self.__counts
+
+  def add(self, sample:float):
+    self.__counts[bisect_right(self.__edges, sample)] += 1
+
+  def clear(self):
+    self.__counts = [0] * (len(self.__edges) + 1)
+
+  def snapshot(self) -> dict:
+    return {
+      'edges': list(self.__edges),
+      'counts': list(self.__counts),
+    }
+
+
+class Task:
+  '''Task executes a block system periodically at a fixed
+  frequency. Deadlines are absolute, the k-th execution is
+  due at start + k * period, hence the execution time does
+  not accumulate as drift. The timing statistics are:
+
+    - ticks : number of executions
+    - overruns : executions that ended after the next
+      deadline
+    - missed : deadlines skipped since the execution could
+      not be started before the following deadline
+    - jitter : histogram of the delay between the deadline
+      and the actual start of execution in seconds'''
+
+  class CyclicError(Exception):
+    def __init__(self, task:Task):
+      super().__init__(
+        f"Task {task} block system never terminates "
+        "and cannot be executed periodically")
+
+  jitter_edges = [
+    1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 5e-2]
+
+  def __init__(self, *start:List[Block], frequency:float,
+               name:str=None):
+    assert frequency > 0, 'Task frequency must be positive'
+    self.__name = name or '|'.join([str(b) for b in start])
+    self.__schedule = Block.compile(*start)
+    if self.__schedule.cycle:
+      raise Task.CyclicError(task=self)
+    self.__period = 1.0 / frequency
+    self.jitter = Histogram(edges=self.jitter_edges)
+    self.reset()
+
+  @property
+  def name(self) -> str:
+    return self.__name
+
+  def __str__(self):
+    return self.name
+
+  @property
+  def schedule(self) -> Schedule:
+    return self.__schedule
+
+  @property
+  def period(self) -> float:
+    return self.__period
+
+  @property
+  def frequency(self) -> float:
+    return 1.0 / self.__period
+
+  @property
+  def deadline(self) -> float:
+    return self.__origin + self.__index * self.__period
+
+  def reset(self):
+    self.__origin = None
+    self.__index = 0
+    self.ticks = 0
+    self.overruns = 0
+    self.missed = 0
+    self.max_jitter = 0.0
+    self.total_jitter = 0.0
+    self.max_duration = 0.0
+    self.total_duration = 0.0
+    self.jitter.clear()
+
+  def start(self, origin:float):
+    self.__origin = origin
+    self.__index = 0
+
+  def execute(self) -> bool:
+    '''Executes the block system. Returns False if the
+    execution was terminated by a block.'''
+    return self.__schedule.execute()
+
+  def account(self, start:float, end:float):
+    '''Updates the timing statistics with an execution that
+    started and ended at the given times and advances the
+    deadline.'''
+    lateness = max(start - self.deadline, 0.0)
+    duration = end - start
+    self.ticks += 1
+    self.jitter.add(lateness)
+    self.max_jitter = max(self.max_jitter, lateness)
+    self.total_jitter += lateness
+    self.max_duration = max(self.max_duration, duration)
+    self.total_duration += duration
+    self.__index += 1
+    if end > self.deadline:
+      self.overruns += 1
+      skipped = int((end - self.deadline) // self.__period)
+      self.missed += skipped
+      self.__index += skipped
+
+  def report(self) -> dict:
+    ticks = self.ticks or 1
+    return {
+      'name': self.name,
+      'frequency': self.frequency,
+      'ticks': self.ticks,
+      'overruns': self.overruns,
+      'missed': self.missed,
+      'mean_jitter': self.total_jitter / ticks,
+      'max_jitter': self.max_jitter,
+      'mean_duration': self.total_duration / ticks,
+      'max_duration': self.max_duration,
+      'jitter': self.jitter.snapshot(),
+    }
+
+
+class Scheduler:
+  '''Scheduler executes a set of Tasks, each at its own
+  frequency, in a single thread. The task with the earliest
+  deadline is executed next, sleeping until its deadline
+  when ahead of time. This allows multi-rate block systems
+  such as a fast control loop next to a slow camera
+  pipeline.
+
+  Time is taken from the given clock, or the current clock
+  at creation, which is also the current clock of the blocks
+  while running. On a SimulatedClock the scheduler advances
+  the clock from deadline to deadline without sleeping, the
+  tasks run in lockstep as fast as possible.'''
+
+  def __init__(self, clock:Clock=None):
+    self.__tasks = list()
+    self.__stopped = threading.Event()
+    self.__clock = clock or Clock.current()
+
+  @property
+  def clock(self) -> Clock:
+    return self.__clock
+
+  @property
+  def tasks(self) -> List[Task]:
+    return self.__tasks
+
+  def add(self, *start:List[Block], frequency:float,
+          name:str=None) -> Task:
+    '''Adds a task executing the block system started from
+    the given blocks at the given frequency in Hz.'''
+    task = Task(*start, frequency=frequency, name=name)
+    self.__tasks.append(task)
+    return task
+
+  def remove(self, task:Task):
+    self.__tasks.remove(task)
+
+  def stop(self):
+    '''Stops the running scheduler, may be called from any
+    thread or from within a block update.'''
+    self.__stopped.set()
+
+  def _now(self) -> float:
+    return self.__clock.now()
+
+  def _sleep_until(self, deadline:float):
+    self.__clock.sleep_until(deadline, self.__stopped)
+
+  def run(self, duration:float=None):
+    '''Runs the tasks for the given duration in seconds, or
+    until stopped or all tasks are terminated if None.'''
+    with self.__clock:
+      self.__run(duration)
+
+  def __run(self, duration:float=None):
+    self.__stopped.clear()
+    origin = self._now()
+    tasks = list(self.__tasks)
+    for task in tasks:
+      task.start(origin=origin)
+    end = None if duration is None else origin + duration
+    while tasks and not self.__stopped.is_set():
+      task = min(tasks, key=lambda t: t.deadline)
+      if end is not None and task.deadline >= end:
+        self._sleep_until(end)
+        break
+      self._sleep_until(task.deadline)
+      if self.__stopped.is_set():
+        break
+      start = self._now()
+      result = task.execute()
+      task.account(start=start, end=self._now())
+      if not result:
+        tasks.remove(task)
+
+  def report(self) -> List[dict]:
+    '''Returns the timing statistics of the tasks'''
+    return [task.report() for task in self.__tasks]
@@ -0,0 +1,53 @@
+import random
+from syedra.core.block import *
+from syedra.core.scheduler import Scheduler
+
+
+
+class Fast(Block):
+  block_name = 'Fast'
+
+  y = OutputPort(initial=0)
+
+  def update(self):
+    self.y += 1
+
+
+class Slow(Block):
+  block_name = 'Slow'
+
+  y = OutputPort(initial=0)
+
+  def update(self):
+    self.y = random.randint(0, 10)
+
+
+class Printer(Block):
+  block_name = 'Printer'
+
+  x = InputPort()
+
+  def update(self):
+    print(f"x = {self.x}")
+
+
+if __name__ == '__main__':
+
+  fast = Fast()
+  slow = Slow()
+  printer = Printer()
+
+  slow['y'] >> printer['x']
+
+  scheduler = Scheduler()
+  scheduler.add(fast, frequency=1000.0)
+  scheduler.add(slow, frequency=2.0)
+
+  try:
+    scheduler.run(duration=5.0)
+  except KeyboardInterrupt:
+    pass
+  for report in scheduler.report():
+    print(f"{report['name']}: {report['ticks']} ticks, "
+          f"{report['missed']} missed, "
+          f"max jitter {report['max_jitter']*1e3:.3f} ms")
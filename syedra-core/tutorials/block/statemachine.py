@@ -1,12 +1,14 @@
 import time
 from random import randint
 from syedra.core.block import Block, InputPort, OutputPort
-from syedra.core.fsm import Machine, State, Event
+from syedra.core.fsm import Machine, MachineBlock, State, Event
 
 
 
 class Indicator(Machine):
 
+  machine_name = 'Indicator'
+
   indicate = State(
     ingress=lambda m: print('ingress'),
     during=lambda m: print(f'during: {m.block.gauge}'),
@@ -19,23 +21,13 @@ class Indicator(Machine):
   ]
   initial = 'indicate'
 
-  def __init__(self, block:Block):
-    super().__init__(name=block.name)
-    self.block = block
-
   
-class BlockMachine(Block):
+class BlockMachine(MachineBlock):
   block_name = 'BlockMachine'
+  machines = [Indicator]
 
   gauge = InputPort(initial=0)
 
-  def __init__(self):
-    super().__init__()
-    self.machine = Indicator(block=self)
-  
-  def update(self):
-    self.machine.update()
-
     
 class RandomSource(Block):
   block_name = 'Random Source'
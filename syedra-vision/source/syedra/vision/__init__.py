@@ -1,4 +1,7 @@
+from .buffer import *
 from .camera import *
+from .source import *
+from .shared import *
 from .display import *
 from .keyboard import *
 from .transform import *
@@ -0,0 +1,70 @@
+from __future__ import annotations
+import sys
+import threading
+from typing import Tuple
+import numpy as np
+
+
+__all__ = [
+  'FramePool',
+]
+
+
+class FramePool:
+  '''FramePool recycles frame buffers to avoid allocating a
+  fresh array for every frame. Blocks lease a buffer of the
+  required shape and write into it in place (such as using
+  the dst argument of OpenCV functions).
+
+  A leased buffer is held by the references of the nodes and
+  blocks it is passed to, including views of it. The pool
+  relies on reference counting, a buffer is returned to the
+  pool as soon as nothing but the pool references it. If all
+  buffers of a shape are in use and the capacity is reached
+  a fresh unpooled buffer is allocated and counted as a
+  miss.'''
+
+  def __init__(self, capacity:int=8):
+    '''capacity: maximum number of pooled buffers per shape
+    and type'''
+    assert capacity > 0, 'Pool capacity must be a positive integer'
+    self.__capacity = capacity
+    self.__buffers = dict()
+    self.__lock = threading.Lock()
+    self.misses = 0
+    self.__idle = self.__references([np.empty(0)], 0)
+
+  @staticmethod
+  def __references(buffers:list, index:int) -> int:
+    return sys.getrefcount(buffers[index])
+
+  @property
+  def capacity(self) -> int:
+    return self.__capacity
+
+  def __len__(self):
+    return sum([len(b) for b in self.__buffers.values()])
+
+  def lease(self, shape:Tuple[int], dtype=np.uint8) -> np.ndarray:
+    '''Returns an idle buffer of the given shape and type.
+    The buffer content is undefined.'''
+    key = (tuple(shape), np.dtype(dtype))
+    with self.__lock:
+      buffers = self.__buffers.setdefault(key, list())
+      for index in range(len(buffers)):
+        if self.__references(buffers, index) <= self.__idle:
+          return buffers[index]
+      buffer = np.empty(shape, dtype=dtype)
+      if len(buffers) < self.__capacity:
+        buffers.append(buffer)
+      else:
+        self.misses += 1
+      return buffer
+
+  def lease_like(self, array:np.ndarray) -> np.ndarray:
+    return self.lease(array.shape, array.dtype)
+
+  def clear(self):
+    '''Drops all pooled buffers'''
+    with self.__lock:
+      self.__buffers = dict()
@@ -1,6 +1,10 @@
 from __future__ import annotations
+import threading
+from collections import deque
+from time import monotonic
 import cv2
 from syedra.core.block import Block, OutputPort
+from .buffer import FramePool
 
 
 __all__ = [
@@ -9,28 +13,117 @@ __all__ = [
 
 
 class Camera(Block):
+  '''Camera acquires frames from a capture device. The
+  capture timestamp is taken from the monotonic clock.
+
+  In threaded mode a background thread continuously grabs
+  frames into a small ring buffer and update delivers the
+  newest frame, waiting for it if no new frame has been
+  captured since the last update. Frames that are captured
+  but never delivered are counted as dropped, failed reads
+  are counted as failures and grabbing goes on until the
+  camera is released or the device is closed.'''
 
   class HardwareError(Exception):
     def __init__(self, camera:Camera):
       super().__init__(
         f"Camera Hardware Error: {camera}")
 
-      
+
   frame = OutputPort(initial=None)
   valid = OutputPort(initial=False)
+  timestamp = OutputPort(initial=None)
+  dropped = OutputPort(initial=0)
 
-  def __init__(self, index:int, name:str='Camera'):
+  def __init__(self, index:int, name:str='Camera',
+               pool:FramePool=None,
+               threaded:bool=False,
+               buffer_size:int=2,
+               timeout:float=1.0):
+    '''threaded: grabs frames in a background thread
+    buffer_size: number of frames kept in the ring buffer
+    timeout: longest wait for a new frame in seconds'''
     super().__init__(name=name)
     self.__index = index
+    self.__pool = pool
     self.__cap = cv2.VideoCapture(self.__index)
     if not self.__cap.isOpened():
       raise Camera.HardwareError(camera=self)
+    self.__timeout = timeout
+    self.__failures = 0
+    self.__thread = None
+    if threaded:
+      self.__ring = deque(maxlen=buffer_size)
+      self.__condition = threading.Condition()
+      self.__sequence = 0
+      self.__delivered = 0
+      self.__running = True
+      self.__thread = threading.Thread(
+        target=self.__capture, name=f"{self.name} Capture",
+        daemon=True)
+      self.__thread.start()
+
+  @property
+  def is_threaded(self) -> bool:
+    return self.__thread is not None
+
+  @property
+  def failures(self) -> int:
+    '''Number of failed reads of the capture thread'''
+    return self.__failures
 
   def __delete__(self):
     super().__delete__()
+    self.release()
+
+  def release(self):
+    '''Stops the capture thread and releases the device'''
+    if self.__thread is not None:
+      with self.__condition:
+        self.__running = False
+        self.__condition.notify_all()
+      self.__thread.join()
+      self.__thread = None
     if self.__cap.isOpened():
       self.__cap.release()
 
+  def __read(self, previous):
+    if self.__pool is None or previous is None:
+      return self.__cap.read()
+    return self.__cap.read(image=self.__pool.lease_like(previous))
+
+  def __capture(self):
+    previous = None
+    while self.__running:
+      valid, frame = self.__read(previous)
+      timestamp = monotonic()
+      with self.__condition:
+        if not valid:
+          self.__failures += 1
+          if not self.__cap.isOpened():
+            self.__running = False
+        else:
+          self.__sequence += 1
+          self.__ring.append((frame, timestamp, self.__sequence))
+        self.__condition.notify_all()
+      previous = frame if valid else None
+
   def update(self):
-    self.valid, self.frame = self.__cap.read()
-    
+    if self.__thread is None:
+      self.valid, self.frame = self.__read(self.frame)
+      self.timestamp = monotonic()
+      return
+    with self.__condition:
+      self.__condition.wait_for(
+        lambda: (not self.__running or
+                 self.__sequence > self.__delivered),
+        timeout=self.__timeout)
+      if self.__sequence > self.__delivered:
+        frame, timestamp, sequence = self.__ring[-1]
+        self.dropped += sequence - self.__delivered - 1
+        self.__delivered = sequence
+        self.valid = True
+        self.frame = frame
+        self.timestamp = timestamp
+      else:
+        self.valid = False
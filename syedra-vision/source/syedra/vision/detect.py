@@ -1,74 +1,419 @@
+from __future__ import annotations
+import math
+from enum import Enum
 from typing import List
 import cv2
 import numpy as np
 from syedra.core.block import Block, InputPort, OutputPort
+from .buffer import FramePool
+from .transform import clip_roi, clear_outside
 
 
 __all__ = [
   'Mask',
+  'ColorMask',
   'Blob',
+  'Tracker',
+  'BatchMask',
+  'BatchBlob',
+  'detect_blob',
+  'detect_blobs',
 ]
 
 
+def _moment_ellipse(moments:dict) -> tuple:
+  '''Returns the (minor, major, angle) of the ellipse with the
+  same second order moments as a shape. Axes are full lengths
+  and the angle is in degrees following cv2.fitEllipse.'''
+  m00 = moments['m00']
+  a = moments['mu20'] / m00
+  b = moments['mu11'] / m00
+  c = moments['mu02'] / m00
+  spread = math.sqrt(((a - c) / 2) ** 2 + b ** 2)
+  major = 4 * math.sqrt(max((a + c) / 2 + spread, 0.0))
+  minor = 4 * math.sqrt(max((a + c) / 2 - spread, 0.0))
+  angle = (math.degrees(0.5 * math.atan2(2 * b, a - c)) + 90) % 180
+  return minor, major, angle
+
+
+def _largest(areas:np.ndarray, min_size:int, count:int) -> List[int]:
+  '''Returns the indices of at most count largest areas of at
+  least min_size in descending order of area.'''
+  if not len(areas):
+    return []
+  if count == 1:
+    order = [int(np.argmax(areas))]
+  elif count < len(areas):
+    order = np.argpartition(areas, -count)[-count:]
+    order = order[np.argsort(areas[order])[::-1]]
+  else:
+    order = np.argsort(areas)[::-1]
+  return [int(i) for i in order if areas[i] >= min_size]
+
+
+def _contour_blobs(image, min_size, count):
+  contours, _ = cv2.findContours(
+    image, cv2.RETR_EXTERNAL,
+    cv2.CHAIN_APPROX_SIMPLE)
+  areas = np.fromiter(
+    (cv2.contourArea(c) for c in contours),
+    dtype=np.float64, count=len(contours))
+  blobs = list()
+  for index in _largest(areas, min_size, count):
+    contour = contours[index]
+    if len(contour) >= 5:
+      centroid, axes, angle = cv2.fitEllipse(contour)
+      minor, major = axes
+    else:
+      moments = cv2.moments(contour)
+      if moments['m00'] > 0:
+        centroid = (moments['m10'] / moments['m00'],
+                    moments['m01'] / moments['m00'])
+        minor, major, angle = _moment_ellipse(moments)
+      else:
+        # points and lines enclose no area
+        x, y = contour.reshape(-1, 2).mean(axis=0)
+        centroid = (float(x), float(y))
+        minor, major, angle = 0.0, 0.0, 0.0
+    blobs.append({
+      'cx': centroid[0],
+      'cy': centroid[1],
+      'minor': minor,
+      'major': major,
+      'angle': angle,
+      'area': float(areas[index]),
+    })
+  return blobs
+
+
+def _component_blobs(image, min_size, count):
+  _, labels, stats, centroids = \
+    cv2.connectedComponentsWithStats(image, connectivity=8)
+  areas = stats[1:, cv2.CC_STAT_AREA]
+  blobs = list()
+  for index in _largest(areas, min_size, count):
+    label = index + 1
+    x, y, w, h = stats[label, :4]
+    moments = cv2.moments(
+      (labels[y:y+h, x:x+w] == label).astype(np.uint8),
+      binaryImage=True)
+    minor, major, angle = _moment_ellipse(moments)
+    blobs.append({
+      'cx': float(centroids[label, 0]),
+      'cy': float(centroids[label, 1]),
+      'minor': minor,
+      'major': major,
+      'angle': angle,
+      'area': float(areas[index]),
+    })
+  return blobs
+
+
+def detect_blobs(image:np.ndarray, min_size:int,
+                 count:int=1,
+                 backend:Blob.Backend=None) -> List[dict]:
+  '''Returns the ellipses fitted to at most count largest
+  blobs of a binary image with at least the given area, in
+  descending order of area.'''
+  assert count > 0, 'Blob count must be a positive integer'
+  backend = Blob.Backend(backend or Blob.Backend.CONTOURS)
+  if backend == Blob.Backend.COMPONENTS:
+    return _component_blobs(image, min_size, count)
+  return _contour_blobs(image, min_size, count)
+
+
+def detect_blob(image:np.ndarray, min_size:int,
+                backend:Blob.Backend=None) -> dict:
+  '''Returns the ellipse fitted to the largest blob of a
+  binary image or None if there is no blob of at least the
+  given area.'''
+  blobs = detect_blobs(image, min_size, backend=backend)
+  return blobs[0] if blobs else None
+
+
 class Mask(Block):
+  '''Mask selects the pixels within a color range. If a region
+  of interest is given only the pixels in the region are
+  selected, the rest of the mask is zero.'''
 
   original = InputPort()
+  roi = InputPort(trigger=False)
   selected = OutputPort(initial=None)
 
   def __init__(self,
                lower_color:List[int],
                upper_color:List[int],
-               name:str='Mask'):
+               name:str='Mask',
+               pool:FramePool=None):
     super().__init__(name=name)
     self.set_color_range(lower_color, upper_color)
+    self.__pool = pool
 
   def set_color_range(self, lower_color, upper_color):
     self.__lower = np.array(lower_color)
     self.__upper = np.array(upper_color)
 
   def update(self):
-    if self.original is not None:
+    if self.original is None:
+      self.selected = None
+      return
+    shape = self.original.shape[:2]
+    dst = (None if self.__pool is None
+           else self.__pool.lease(shape))
+    region = clip_roi(self.roi, shape)
+    if region is None:
       self.selected = cv2.inRange(
-        self.original, self.__lower, self.__upper)
-    else:
+        self.original, self.__lower, self.__upper, dst=dst)
+      return
+    if dst is None:
+      dst = np.empty(shape, dtype=np.uint8)
+    x1, y1, x2, y2 = region
+    cv2.inRange(
+      self.original[y1:y2, x1:x2], self.__lower, self.__upper,
+      dst=dst[y1:y2, x1:x2])
+    self.selected = clear_outside(dst, region)
+
+
+class ColorMask(Block):
+  '''ColorMask fuses Convert and Mask, selecting the pixels of
+  a BGR frame whose HSV color is within a color range. The
+  HSV conversion is written into a scratch buffer owned by
+  the block and reused across frames, so no intermediate
+  frame is allocated or passed through a port. If a region
+  of interest is given only the pixels in the region are
+  selected, the rest of the mask is zero.'''
+
+  original = InputPort()
+  roi = InputPort(trigger=False)
+  selected = OutputPort(initial=None)
+
+  def __init__(self,
+               lower_color:List[int],
+               upper_color:List[int],
+               name:str='Color Mask',
+               pool:FramePool=None):
+    super().__init__(name=name)
+    self.set_color_range(lower_color, upper_color)
+    self.__pool = pool
+    self.__scratch = None
+
+  def set_color_range(self, lower_color, upper_color):
+    self.__lower = np.array(lower_color)
+    self.__upper = np.array(upper_color)
+
+  def __scratch_like(self, original:np.ndarray) -> np.ndarray:
+    if (self.__scratch is None or
+        self.__scratch.shape != original.shape):
+      self.__scratch = np.empty_like(original)
+    return self.__scratch
+
+  def update(self):
+    if self.original is None:
       self.selected = None
+      return
+    shape = self.original.shape[:2]
+    dst = (None if self.__pool is None
+           else self.__pool.lease(shape))
+    scratch = self.__scratch_like(self.original)
+    region = clip_roi(self.roi, shape)
+    if region is None:
+      hsv = cv2.cvtColor(
+        self.original, cv2.COLOR_BGR2HSV, dst=scratch)
+      self.selected = cv2.inRange(
+        hsv, self.__lower, self.__upper, dst=dst)
+      return
+    if dst is None:
+      dst = np.empty(shape, dtype=np.uint8)
+    x1, y1, x2, y2 = region
+    window = cv2.cvtColor(
+      self.original[y1:y2, x1:x2], cv2.COLOR_BGR2HSV,
+      dst=scratch[y1:y2, x1:x2])
+    cv2.inRange(
+      window, self.__lower, self.__upper,
+      dst=dst[y1:y2, x1:x2])
+    self.selected = clear_outside(dst, region)
 
 
 class Blob(Block):
+  '''Blob detects the largest blob of a binary image. If a
+  region of interest is given only the region is scanned,
+  the detected centroid is in image coordinates.
+
+  With count greater than one the blobs output lists the
+  largest blobs in descending order of area. Blobs are found
+  by one of the backends:
+
+    - CONTOURS : external contours with a fitted ellipse, the
+      area is the contour area
+    - COMPONENTS : connected components found in a single
+      native call, the area is the pixel count and the
+      ellipse has the second order moments of the blob. It
+      is faster on noisy masks with many small blobs.'''
+
+  class Backend(Enum):
+    CONTOURS = 'contours'
+    COMPONENTS = 'components'
 
   image = InputPort(initial=None)
+  roi = InputPort(trigger=False)
   detected = OutputPort(initial=None)
+  blobs = OutputPort(initial=None)
   
   def __init__(self,
                min_size:int=200,
+               count:int=1,
+               backend:Backend=Backend.CONTOURS,
                name:str='Blob Detector'):
     super().__init__(name=name)
+    assert count > 0, 'Blob count must be a positive integer'
     self.set_min_size(min_size)
+    self.__count = count
+    self.__backend = Blob.Backend(backend)
 
   def set_min_size(self, min_size:int):
     self.__min_size = min_size
 
   def update(self):
     if self.image is None:
-      self.blob = None
+      self.detected, self.blobs = None, None
       return
-    contours, _ = cv2.findContours(
-      self.image, cv2.RETR_EXTERNAL,
-      cv2.CHAIN_APPROX_SIMPLE)
-    areas = [cv2.contourArea(c) for c in contours]
-    if areas and max(areas) >= self.__min_size:
-      largest_blob = sorted(
-        [c for c,a in zip(contours, areas) if a >= self.__min_size],
-        key=lambda c: cv2.contourArea(c), reverse=True)[0]
-      centroid, axes, angle = cv2.fitEllipse(largest_blob)
-      self.detected = {
-        'cx': centroid[0],
-        'cy': centroid[1],
-        'minor': axes[0],
-        'major': axes[1],
-        'angle': angle,
-      }
+    region = clip_roi(self.roi, self.image.shape)
+    if region is None:
+      blobs = detect_blobs(
+        self.image, self.__min_size, self.__count,
+        self.__backend)
+    else:
+      x1, y1, x2, y2 = region
+      blobs = detect_blobs(
+        self.image[y1:y2, x1:x2], self.__min_size, self.__count,
+        self.__backend)
+      for blob in blobs:
+        blob['cx'] += x1
+        blob['cy'] += y1
+    self.detected = blobs[0] if blobs else None
+    self.blobs = blobs
+
+
+class Tracker(Block):
+  '''Tracker derives the region of interest of the next frame
+  from the detected blob. The region is a square around the
+  blob centroid, margin times the blob major axis wide but
+  at least min_window pixels. When the blob is lost the
+  region is widened by the growth factor on each frame, and
+  after patience frames without detection the region is
+  dropped so that the whole frame is processed again.
+
+  The roi output is meant to be connected to the roi inputs
+  of Convert, Mask and Blob. These inputs do not trigger
+  execution, hence the feedback does not form a loop.'''
+
+  detected = InputPort(initial=None)
+  roi = OutputPort(initial=None)
+
+  def __init__(self,
+               margin:float=2.0,
+               min_window:int=100,
+               growth:float=2.0,
+               patience:int=5,
+               name:str='Tracker'):
+    super().__init__(name=name)
+    assert growth >= 1.0, 'Growth factor must be at least 1'
+    self.__margin = margin
+    self.__min_window = min_window
+    self.__growth = growth
+    self.__patience = patience
+    self.reset()
+
+  @property
+  def is_tracking(self) -> bool:
+    return self.__center is not None
+
+  def reset(self):
+    self.__center = None
+    self.__half = None
+    self.__lost = 0
+
+  def update(self):
+    detected = self.detected
+    if detected is not None:
+      self.__center = (detected['cx'], detected['cy'])
+      self.__half = max(
+        self.__margin * detected['major'] / 2,
+        self.__min_window / 2)
+      self.__lost = 0
+    elif self.__center is not None:
+      self.__lost += 1
+      if self.__lost > self.__patience:
+        self.reset()
+      else:
+        self.__half *= self.__growth
+    if self.__center is None:
+      self.roi = None
+    else:
+      cx, cy = self.__center
+      half = self.__half
+      self.roi = (
+        int(cx - half), int(cy - half),
+        int(cx + half) + 1, int(cy + half) + 1)
+
+
+class BatchMask(Block):
+  '''Batch variant of Mask processing a stacked batch of
+  frames of shape (N, H, W, 3) in a single native call. The
+  selected batch has the shape (N, H, W).'''
+
+  original = InputPort()
+  selected = OutputPort(initial=None)
+
+  def __init__(self,
+               lower_color:List[int],
+               upper_color:List[int],
+               name:str='Batch Mask'):
+    super().__init__(name=name)
+    self.set_color_range(lower_color, upper_color)
+
+  def set_color_range(self, lower_color, upper_color):
+    self.__lower = np.array(lower_color)
+    self.__upper = np.array(upper_color)
+
+  def update(self):
+    if self.original is not None:
+      count, height, width, channels = self.original.shape
+      rows = np.ascontiguousarray(self.original).reshape(
+        count * height, width, channels)
+      self.selected = cv2.inRange(
+        rows, self.__lower, self.__upper).reshape(
+          count, height, width)
     else:
+      self.selected = None
+
+
+class BatchBlob(Block):
+  '''Batch variant of Blob detecting the largest blob in each
+  frame of a stacked batch of binary images of shape
+  (N, H, W). The detected output is the list of per frame
+  results.'''
+
+  image = InputPort(initial=None)
+  detected = OutputPort(initial=None)
+
+  def __init__(self,
+               min_size:int=200,
+               backend:Blob.Backend=Blob.Backend.CONTOURS,
+               name:str='Batch Blob Detector'):
+    super().__init__(name=name)
+    self.set_min_size(min_size)
+    self.__backend = Blob.Backend(backend)
+
+  def set_min_size(self, min_size:int):
+    self.__min_size = min_size
+
+  def update(self):
+    if self.image is None:
       self.detected = None
+      return
+    self.detected = [
+      detect_blob(image, self.__min_size, self.__backend)
+      for image in self.image]
 
 
@@ -1,29 +1,161 @@
+from __future__ import annotations
+import queue
+import threading
+from time import monotonic
 from typing import Tuple
 import cv2
+import numpy as np
 from syedra.core.block import Block, InputPort, OutputPort
 
 
 __all__ = [
+  'Renderer',
   'Display',
   'Sketch',
   'BlobSketch',
 ]
 
 
+class Renderer:
+  '''Renderer shows the frames of Display blocks in a dedicated
+  render thread, so that window updates never throttle the
+  block execution. Each window keeps only the latest frame
+  handed over, frames replaced before being rendered are
+  counted as dropped. Windows are refreshed at most rate
+  times per second, or as fast as possible if None.
+
+  The render thread owns the windows and also polls the
+  keyboard, the keys pressed are read by Keyboard blocks
+  through get_key.
+
+  In headless mode no window is opened and no thread is
+  started. The latest frame of each window is kept as a
+  sample that can be read with latest, keys can be injected
+  with press.'''
+
+  def __init__(self, rate:float=30.0, headless:bool=False,
+               name:str='Renderer'):
+    assert rate is None or rate > 0, \
+      'Refresh rate must be positive'
+    self.__period = 0.0 if rate is None else 1.0 / rate
+    self.__headless = headless
+    self.__pending = dict()
+    self.__latest = dict()
+    self.__keys = queue.Queue()
+    self.__condition = threading.Condition()
+    self.__running = True
+    self.rendered = 0
+    self.dropped = 0
+    self.__thread = None
+    if not headless:
+      self.__thread = threading.Thread(
+        target=self.__run, name=name, daemon=True)
+      self.__thread.start()
+
+  @property
+  def is_headless(self) -> bool:
+    return self.__headless
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def show(self, window:str, image:np.ndarray):
+    '''Hands the image over to be shown in the window. The
+    image is referenced, not copied.'''
+    with self.__condition:
+      if window in self.__pending:
+        self.dropped += 1
+      self.__latest[window] = image
+      if not self.__headless:
+        self.__pending[window] = image
+        self.__condition.notify_all()
+
+  def latest(self, window:str) -> np.ndarray:
+    '''Returns the latest image handed over to the window'''
+    with self.__condition:
+      return self.__latest.get(window)
+
+  def press(self, key:int):
+    '''Injects a key press'''
+    self.__keys.put(key)
+
+  def get_key(self, timeout:float=None) -> int:
+    '''Returns the next key pressed, waiting at most timeout
+    seconds or indefinitely if None. Returns None if no key
+    was pressed.'''
+    try:
+      if timeout is not None and timeout <= 0:
+        return self.__keys.get_nowait()
+      return self.__keys.get(timeout=timeout)
+    except queue.Empty:
+      return None
+
+  def close(self):
+    '''Stops the render thread and destroys the windows'''
+    with self.__condition:
+      self.__running = False
+      self.__condition.notify_all()
+    if self.__thread is not None:
+      self.__thread.join()
+      self.__thread = None
+
+  def __run(self):
+    shown = False
+    deadline = monotonic()
+    while True:
+      with self.__condition:
+        if not self.__running:
+          break
+        frames, self.__pending = self.__pending, dict()
+      for window,image in frames.items():
+        cv2.imshow(window, image)
+        self.rendered += 1
+        shown = True
+      deadline = max(deadline + self.__period, monotonic())
+      delay = deadline - monotonic()
+      if not shown:
+        with self.__condition:
+          self.__condition.wait_for(
+            lambda: self.__pending or not self.__running,
+            timeout=max(delay, 0.01))
+        continue
+      key = cv2.waitKey(max(1, int(delay * 1000)))
+      if key != -1:
+        self.__keys.put(key & 0xFF)
+    if shown:
+      cv2.destroyAllWindows()
+
+
 class Display(Block):
+  '''Display shows the image in a window named after the block.
+  Without a renderer the window is updated within the block
+  update. With a renderer the image is handed over to the
+  render thread, the image is copied beforehand if copy is
+  set, for pipelines modifying frames in place.'''
 
   image = InputPort(initial=None)
   ready = OutputPort(initial=False)
 
-  def __init__(self, name:str='Display'):
+  def __init__(self, name:str='Display',
+               renderer:Renderer=None,
+               copy:bool=False):
     super().__init__(name=name)
+    self.__renderer = renderer
+    self.__copy = copy
   
   def update(self):
-    if self.image is not None:
+    if self.image is None:
+      self.ready = False
+    elif self.__renderer is None:
       cv2.imshow(self.name, self.image)
       self.ready = True
     else:
-      self.ready = False
+      image = self.image.copy() if self.__copy else self.image
+      self.__renderer.show(self.name, image)
+      self.ready = True
 
 
 class Sketch(Block):
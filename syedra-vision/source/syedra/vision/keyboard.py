@@ -2,6 +2,7 @@ from __future__ import annotations
 from typing import List
 import cv2
 from syedra.core.block import Block, InputPort
+from .display import Renderer
 
 
 __all__ = [
@@ -10,26 +11,45 @@ __all__ = [
 
 
 class Keyboard(Block):
+  '''Keyboard waits for a key press and quits on q. Without a
+  renderer the keys are read within the block update. With a
+  renderer the keys polled by the render thread are read, a
+  headless renderer is never waited for.'''
 
   class QuitCommand(Exception):
     def __init__(self):
       super().__init__("Keyboard signal to quit")
 
-  def __init__(self, delay:int=0, input_ports:List[str]=['show']):
+  def __init__(self, delay:int=0, input_ports:List[str]=['show'],
+               renderer:Renderer=None):
     '''
     delay: hold duration in msec. Waits indefinitely if 0
     input_ports: List of names for input port to be created
+    renderer: Renderer polling the keys
     '''
     super().__init__(name='Keyboard')
     self.__delay = delay
+    self.__renderer = renderer
     for port_name in input_ports:
       self._add_port(port_name, InputPort)
 
+  def __read(self) -> int:
+    if self.__renderer is None:
+      return cv2.waitKey(self.__delay) & 0xFF
+    if self.__renderer.is_headless:
+      timeout = 0
+    else:
+      timeout = self.__delay / 1000 if self.__delay else None
+    return self.__renderer.get_key(timeout=timeout)
+
   def update(self):
     try:
-      keypress = cv2.waitKey(self.__delay) & 0xFF
+      keypress = self.__read()
     except KeyboardInterrupt:
       keypress = ord('q')
     if keypress == ord('q'):
-      cv2.destroyAllWindows()
+      if self.__renderer is None:
+        cv2.destroyAllWindows()
+      else:
+        self.__renderer.close()
       raise Keyboard.QuitCommand()
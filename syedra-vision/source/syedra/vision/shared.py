@@ -0,0 +1,517 @@
+from __future__ import annotations
+import multiprocessing
+import queue
+import threading
+import traceback
+from contextvars import copy_context
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, NamedTuple
+import numpy as np
+from syedra.core.block import Block, Slot
+from syedra.core.pipeline import Pipeline
+
+
+__all__ = [
+  'SharedFrame',
+  'SharedRing',
+  'ProcessPipeline',
+]
+
+
+class SharedFrame(NamedTuple):
+  '''SharedFrame describes a frame stored in a slot of a
+  SharedRing. Only the descriptor crosses the process
+  boundary, the frame itself stays in shared memory.'''
+  ring: str
+  stage: int
+  slot: int
+  offset: int
+  shape: tuple
+  dtype: str
+
+
+class SharedRing:
+  '''SharedRing is a ring of equally sized slots in a shared
+  memory block. A slot holds the frames of a packet back to
+  back. The ring is created by the producing process and
+  attached by name in the consuming processes, frames are
+  read as views without copying. Closing a ring only unmaps
+  it, the ring is removed by unlink once no process attaches
+  to it anymore.'''
+
+  class CapacityError(Exception):
+    def __init__(self, ring:SharedRing, size:int):
+      super().__init__(
+        f"Frames of {size} bytes exceed the slot size "
+        f"{ring.slot_size} of ring {ring.name}")
+
+  ALIGNMENT = 64
+
+  def __init__(self, slot_size:int=None, slots:int=None,
+               name:str=None):
+    '''Creates a ring of the given number of slots, or
+    attaches to the existing ring of the given name.'''
+    if name is None:
+      assert slot_size > 0 and slots > 0, \
+        'Slot size and count must be positive integers'
+      self.__slot_size = SharedRing.aligned(slot_size)
+      self.__memory = shared_memory.SharedMemory(
+        create=True, size=self.__slot_size * slots)
+    else:
+      self.__memory = shared_memory.SharedMemory(name=name)
+      self.__slot_size = slot_size
+
+  @staticmethod
+  def aligned(size:int) -> int:
+    alignment = SharedRing.ALIGNMENT
+    return (size + alignment - 1) // alignment * alignment
+
+  @property
+  def name(self) -> str:
+    return self.__memory.name
+
+  @property
+  def slot_size(self) -> int:
+    return self.__slot_size
+
+  def write(self, stage:int, slot:int,
+            frames:Dict[int, np.ndarray]) -> Dict[int, SharedFrame]:
+    '''Copies the frames into the slot and returns their
+    descriptors'''
+    size = sum([SharedRing.aligned(f.nbytes) for f in frames.values()])
+    if size > self.__slot_size:
+      raise SharedRing.CapacityError(ring=self, size=size)
+    offset = slot * self.__slot_size
+    descriptors = dict()
+    for key,frame in frames.items():
+      view = np.ndarray(
+        frame.shape, dtype=frame.dtype,
+        buffer=self.__memory.buf, offset=offset)
+      np.copyto(view, frame)
+      descriptors[key] = SharedFrame(
+        ring=self.name, stage=stage, slot=slot, offset=offset,
+        shape=frame.shape, dtype=frame.dtype.str)
+      offset += SharedRing.aligned(frame.nbytes)
+    return descriptors
+
+  def read(self, frame:SharedFrame) -> np.ndarray:
+    '''Returns a view of the described frame'''
+    return np.ndarray(
+      frame.shape, dtype=np.dtype(frame.dtype),
+      buffer=self.__memory.buf, offset=frame.offset)
+
+  def close(self):
+    self.__memory.close()
+
+  def unlink(self):
+    self.__memory.unlink()
+
+
+class Failure:
+  '''Failure carries the traceback of an exception raised in a
+  stage to the parent process.'''
+
+  def __init__(self, stage:int, message:str):
+    self.stage = stage
+    self.message = message
+
+
+class Stop:
+  '''Stop requests the pipeline to stop after a block
+  terminated the execution in a stage.'''
+
+
+class Stage:
+  '''Stage encodes and decodes the packets passed between the
+  stages of a ProcessPipeline. Frames produced in the stage
+  are written into its own SharedRing, a slot is taken from
+  the free slots for each packet and returned once the packet
+  has been collected. A larger ring replaces the ring when
+  the frames outgrow its slots, the slot numbers carry over
+  and the replaced rings are kept until the stage is closed
+  since packets in flight may still refer to them.'''
+
+  def __init__(self, index:int, blocks:List[Block],
+               consumed:Dict[int, object],
+               produced:Dict[int, object],
+               free:multiprocessing.Queue,
+               slots:int):
+    self.index = index
+    self.blocks = blocks
+    self.__consumed = consumed
+    self.__produced = produced
+    self.__free = free
+    self.__slots = slots
+    self.__ring = None
+    self.__retired = list()
+    self.__rings = dict()
+    self.created = list()
+
+  def attached(self, name:str) -> SharedRing:
+    ring = self.__rings.get(name)
+    if ring is None:
+      ring = SharedRing(name=name)
+      self.__rings[name] = ring
+    return ring
+
+  def read(self, value):
+    if isinstance(value, SharedFrame):
+      return self.attached(value.ring).read(value)
+    return value
+
+  def decode(self, packet:dict):
+    for key,slot in self.__consumed.items():
+      slot.value = self.read(packet[key])
+
+  def encode(self, packet:dict):
+    frames = dict()
+    for key,slot in self.__produced.items():
+      if isinstance(slot.value, np.ndarray):
+        frames[key] = slot.value
+      else:
+        packet[key] = slot.value
+    if not frames:
+      return
+    size = sum([SharedRing.aligned(f.nbytes) for f in frames.values()])
+    if self.__ring is None or size > self.__ring.slot_size:
+      if self.__ring is None:
+        for slot in range(self.__slots):
+          self.__free.put(slot)
+      else:
+        self.__retired.append(self.__ring)
+      self.__ring = SharedRing(slot_size=size, slots=self.__slots)
+      self.created.append(self.__ring.name)
+    packet.update(
+      self.__ring.write(self.index, self.__free.get(), frames))
+
+  def update(self):
+    for block in self.blocks:
+      block.update()
+
+  def close(self):
+    '''Closes the rings, the created rings are removed with
+    unlink() once no stage refers to them anymore'''
+    for ring in self.__rings.values():
+      ring.close()
+    for ring in self.__retired:
+      ring.close()
+    if self.__ring is not None:
+      self.__ring.close()
+
+  @staticmethod
+  def unlink(names:List[str]):
+    '''Removes the rings of the given names'''
+    for name in names:
+      try:
+        ring = SharedRing(name=name)
+      except FileNotFoundError:
+        continue
+      ring.close()
+      ring.unlink()
+
+
+def run_stage(index:int, specs:list, values:dict,
+              consumed:List[int], produced:List[int],
+              inbox, outbox, free, slots:int, created):
+  '''Executes detached copies of the blocks of a stage in a
+  worker process'''
+  nodes = {key: Slot(value) for key,value in values.items()}
+  blocks = list()
+  for cls,state,ports in specs:
+    block = cls.__new__(cls)
+    block.__dict__.update(state)
+    block._latches = {
+      name: nodes[key] for name,key in ports.items()}
+    blocks.append(block)
+  stage = Stage(
+    index=index, blocks=blocks,
+    consumed={key: nodes[key] for key in consumed},
+    produced={key: nodes[key] for key in produced},
+    free=free, slots=slots)
+  failed = False
+  try:
+    while True:
+      packet = inbox.get()
+      if packet is None:
+        break
+      if failed or isinstance(packet, (Failure, Stop)):
+        outbox.put(packet)
+        continue
+      try:
+        stage.decode(packet)
+        stage.update()
+        stage.encode(packet)
+      except Block.Terminated:
+        failed = True
+        packet = Stop()
+      except BaseException:
+        failed = True
+        packet = Failure(index, traceback.format_exc())
+      outbox.put(packet)
+    outbox.put(None)
+  finally:
+    stage.close()
+    for name in stage.created:
+      created.put(name)
+
+
+class ProcessPipeline:
+  '''ProcessPipeline executes the stages of a block system in
+  separate processes, so that CPU bound blocks run on
+  separate cores. Stages are partitioned as in Pipeline. The
+  first stage runs in a thread of the calling process, hence
+  it may hold devices such as cameras. Each following stage
+  runs detached copies of its blocks in a worker process,
+  blocks of these stages must be picklable excluding their
+  ports.
+
+  Frames, NumPy array values of nodes, are written into
+  shared memory rings owned by the producing stage and only
+  their descriptors are passed on. Other values are pickled
+  through the queues connecting the stages. A slot is
+  released once its packet reaches the end of the pipeline,
+  where the values of the last packet are copied back into
+  the nodes of the calling process and the rings are
+  removed once the pipeline finished. Block attributes
+  changed in worker processes are not copied back.'''
+
+  class RemoteError(Exception):
+    def __init__(self, stage:int, message:str):
+      super().__init__(
+        f"Stage {stage} failed in worker process\n{message}")
+
+  def __init__(self, *start:List[Block],
+               stages:List[List[Block]]=None,
+               depth:int=2,
+               slots:int=None,
+               context:str=None):
+    '''depth: number of packets queued between stages
+    slots: number of slots of the shared memory rings
+    context: multiprocessing start method'''
+    schedule = Block.compile(*start)
+    if schedule.cycle:
+      raise Pipeline.CyclicError(schedule=schedule)
+    order = [block for wave in schedule.waves for block in wave]
+    if stages is None:
+      stages = schedule.waves
+    self.__stages = Pipeline._partition(order, stages)
+    self.__context = multiprocessing.get_context(context)
+    self.__depth = depth
+    self.__slots = slots or (depth + 1) * len(self.__stages) + 1
+    self.__keys = dict()
+    for stage in self.__stages:
+      for block in stage:
+        for latch in block.latches():
+          self.__keys.setdefault(latch._node, len(self.__keys))
+    self.__nodes = {key: node for node,key in self.__keys.items()}
+    self.__stopped = threading.Event()
+    self.__exception = None
+    self.__last = dict()
+    self.__threads = list()
+    self.__processes = list()
+    self.__queues = list()
+    self.__source = None
+    self.__created = None
+
+  @property
+  def stages(self) -> List[List[Block]]:
+    return self.__stages
+
+  def __produced(self, stage:List[Block]) -> List[int]:
+    return list(dict.fromkeys(
+      self.__keys[latch._node]
+      for block in stage for latch in block.outputs))
+
+  def __consumed(self, index:int) -> List[int]:
+    earlier = set(
+      key for stage in self.__stages[:index]
+      for key in self.__produced(stage))
+    return list(dict.fromkeys(
+      self.__keys[latch._node]
+      for block in self.__stages[index]
+      for latch in block.latches()
+      if latch.is_input and self.__keys[latch._node] in earlier))
+
+  def __spec(self, stage:List[Block]):
+    specs = [
+      (type(block), block._detached_state(),
+       {name: self.__keys[latch._node]
+        for name,latch in block._latches.items()})
+      for block in stage]
+    values = {
+      self.__keys[latch._node]: latch._node.value
+      for block in stage for latch in block.latches()}
+    return specs, values
+
+  def __put(self, channel, packet):
+    while True:
+      try:
+        channel.put(packet, timeout=0.1)
+        return
+      except queue.Full:
+        if self.__stopped.is_set() and packet is not None:
+          return
+
+  def __run_source(self, stage:Stage, outbox, count:int):
+    iteration = 0
+    try:
+      while not self.__stopped.is_set():
+        if count is not None and iteration >= count:
+          break
+        iteration += 1
+        stage.update()
+        packet = dict()
+        stage.encode(packet)
+        self.__put(outbox, packet)
+    except Block.Terminated:
+      pass
+    except BaseException as exception:
+      if self.__exception is None:
+        self.__exception = exception
+      self.__stopped.set()
+    finally:
+      self.__put(outbox, None)
+      stage.close()
+
+  def __collect(self, stage:Stage, inbox, frees):
+    # the slots of the last packet are held until the next one
+    # arrives, only the final packet is copied out of the rings
+    held = None
+    packet = None
+    while True:
+      received = inbox.get()
+      if received is None:
+        break
+      if isinstance(received, Failure):
+        if self.__exception is None:
+          self.__exception = ProcessPipeline.RemoteError(
+            stage=received.stage, message=received.message)
+        self.__stopped.set()
+        continue
+      if isinstance(received, Stop):
+        self.__stopped.set()
+        continue
+      if held is not None:
+        self.__release(held, frees)
+      packet = received
+      held = packet
+    if packet is not None:
+      self.__last = {
+        key: stage.read(value).copy()
+        if isinstance(value, SharedFrame) else value
+        for key,value in packet.items()}
+      self.__release(held, frees)
+    stage.close()
+
+  def __release(self, packet:dict, frees):
+    released = set(
+      (value.stage, value.slot) for value in packet.values()
+      if isinstance(value, SharedFrame))
+    for index,slot in released:
+      frees[index].put(slot)
+
+  def start(self, count:int=None):
+    '''Starts the stages. The first stage is executed count
+    times, or until the pipeline is stopped if None.'''
+    assert not self.__threads, 'Pipeline is already running'
+    self.__stopped.clear()
+    self.__exception = None
+    self.__last = dict()
+    context = self.__context
+    stages = len(self.__stages)
+    # Workers must share the resource tracker of this process,
+    # otherwise rings are removed when their creator exits
+    resource_tracker.ensure_running()
+    channels = [context.Queue(maxsize=self.__depth)
+                for _ in range(stages)]
+    frees = [context.Queue() for _ in range(stages)]
+    self.__created = context.Queue()
+    self.__queues = channels + frees + [self.__created]
+    self.__source = source = Stage(
+      index=0, blocks=self.__stages[0], consumed=dict(),
+      produced={key: self.__nodes[key]
+                for key in self.__produced(self.__stages[0])},
+      free=frees[0], slots=self.__slots)
+    collector = Stage(
+      index=stages, blocks=list(), consumed=dict(),
+      produced=dict(), free=None, slots=0)
+    self.__processes = list()
+    for index in range(1, stages):
+      specs, values = self.__spec(self.__stages[index])
+      self.__processes.append(context.Process(
+        target=run_stage,
+        args=(index, specs, values,
+              self.__consumed(index),
+              self.__produced(self.__stages[index]),
+              channels[index-1], channels[index],
+              frees[index], self.__slots, self.__created),
+        name=f"Pipeline Stage {index}", daemon=True))
+    for process in self.__processes:
+      process.start()
+    # the first stage sees the clock scopes active at start
+    self.__threads = [
+      threading.Thread(
+        target=copy_context().run,
+        args=(self.__run_source, source, channels[0], count),
+        name='Pipeline Stage 0', daemon=True),
+      threading.Thread(
+        target=self.__collect,
+        args=(collector, channels[-1], frees),
+        name='Pipeline Collector', daemon=True),
+    ]
+    for thread in self.__threads:
+      thread.start()
+
+  def stop(self):
+    self.__stopped.set()
+
+  def join(self, poll:float=0.1):
+    '''Waits for the stages to finish and raises the first
+    exception raised by a stage if any.'''
+    try:
+      for thread in self.__threads:
+        while thread.is_alive():
+          thread.join(timeout=poll)
+    except BaseException:
+      self.stop()
+      raise
+    for process in self.__processes:
+      process.join()
+    self.__unlink()
+    # the first stage updates the nodes of this process itself
+    source = set(
+      self.__keys[latch._node]
+      for block in self.__stages[0] for latch in block.latches())
+    for key,value in self.__last.items():
+      if key not in source:
+        self.__nodes[key].value = value
+    self.__last = dict()
+    self.__threads = list()
+    self.__processes = list()
+    self.__queues = list()
+    if self.__exception is not None:
+      raise self.__exception
+
+  def __unlink(self):
+    '''Removes the rings created by the stages, which are
+    reported by the workers as they exit'''
+    if self.__source is None:
+      return
+    names = list(self.__source.created)
+    while True:
+      try:
+        names.append(self.__created.get_nowait())
+      except queue.Empty:
+        break
+    Stage.unlink(names)
+    self.__source = None
+
+  def run(self, count:int=None):
+    '''Runs the pipeline until the first stage has been
+    executed count times, a block terminates the execution
+    or an exception occurs.'''
+    try:
+      self.start(count=count)
+      self.join()
+    finally:
+      self.stop()
@@ -0,0 +1,335 @@
+from __future__ import annotations
+import glob
+import os
+import queue
+import threading
+from enum import Enum
+from time import monotonic, sleep
+from typing import Callable, List, Tuple, Union
+import cv2
+import numpy as np
+from syedra.core.block import Block, OutputPort
+
+
+__all__ = [
+  'FrameSource',
+  'VideoFile',
+  'ImageSequence',
+  'RawFrames',
+  'Synthetic',
+]
+
+
+class Prefetcher:
+  '''Prefetcher reads frames ahead in a background thread
+  into a bounded queue. The reader returns None at the end of
+  the stream. An exception raised by the reader ends the
+  stream and is raised again by get().'''
+
+  __END = object()
+
+  def __init__(self, reader:Callable[[], np.ndarray],
+               depth:int=4, name:str='Prefetch'):
+    self.__reader = reader
+    self.__queue = queue.Queue(maxsize=depth)
+    self.__running = True
+    self.__exception = None
+    self.__thread = threading.Thread(
+      target=self.__run, name=name, daemon=True)
+    self.__thread.start()
+
+  def __run(self):
+    while self.__running:
+      try:
+        frame = self.__reader()
+      except Exception as exception:
+        self.__exception = exception
+        frame = None
+      item = Prefetcher.__END if frame is None else frame
+      while self.__running:
+        try:
+          self.__queue.put(item, timeout=0.1)
+          break
+        except queue.Full:
+          pass
+      if item is Prefetcher.__END:
+        return
+
+  def get(self) -> np.ndarray:
+    item = self.__queue.get()
+    if item is Prefetcher.__END:
+      self.__queue.put(item)
+      if self.__exception is not None:
+        raise self.__exception
+      return None
+    return item
+
+  def close(self):
+    self.__running = False
+    self.__thread.join()
+
+
+class FrameSource(Block):
+  '''FrameSource is the base of the blocks producing frames
+  from sources other than a camera. It exposes the same frame
+  and valid ports as Camera, so that the sources can replace
+  a camera in any pipeline. Child classes implement _read()
+  returning the next frame or None at the end of the stream.
+
+  In free-running mode frames are delivered at the source
+  frame rate like a camera, the update waits for the next
+  frame and frames that are overdue are skipped and counted
+  as dropped. In as-fast-as-possible mode every frame is
+  delivered immediately to measure the maximum pipeline
+  throughput.
+
+  At the end of the stream valid is False, frame is None and
+  exhausted is set. Looping sources restart instead.'''
+
+  class Mode(Enum):
+    FREE_RUNNING = 'free-running'
+    FAST = 'as-fast-as-possible'
+
+  frame = OutputPort(initial=None)
+  valid = OutputPort(initial=False)
+  timestamp = OutputPort(initial=None)
+  dropped = OutputPort(initial=0)
+
+  def __init__(self, fps:float=30.0,
+               mode:Mode=Mode.FAST,
+               loop:bool=False,
+               name:str='Source'):
+    super().__init__(name=name)
+    assert fps > 0, 'Frame rate must be positive'
+    self.__fps = fps
+    self.__mode = FrameSource.Mode(mode)
+    self.__loop = loop
+    self.__origin = None
+    self.__index = 0
+    self.exhausted = False
+
+  @property
+  def fps(self) -> float:
+    return self.__fps
+
+  @property
+  def mode(self) -> Mode:
+    return self.__mode
+
+  def _read(self) -> np.ndarray:
+    '''Returns the next frame or None at the end of the
+    stream'''
+    raise NotImplementedError
+
+  def _rewind(self):
+    '''Restarts the stream from the first frame'''
+    raise NotImplementedError
+
+  def _skip(self, count:int):
+    '''Skips the given number of frames'''
+    for _ in range(count):
+      if self.__next() is None:
+        return
+
+  def __next(self) -> np.ndarray:
+    frame = self._read()
+    if frame is None and self.__loop:
+      self._rewind()
+      frame = self._read()
+    return frame
+
+  def __pace(self):
+    now = monotonic()
+    if self.__origin is None:
+      self.__origin = now
+      return
+    self.__index += 1
+    due = self.__origin + self.__index / self.__fps
+    if due > now:
+      sleep(due - now)
+    else:
+      overdue = int((now - due) * self.__fps)
+      if overdue:
+        self._skip(overdue)
+        self.dropped += overdue
+        self.__index += overdue
+
+  def update(self):
+    if self.exhausted:
+      self.valid, self.frame = False, None
+      return
+    if self.__mode == FrameSource.Mode.FREE_RUNNING:
+      self.__pace()
+    frame = self.__next()
+    self.timestamp = monotonic()
+    if frame is None:
+      self.exhausted = True
+      self.valid, self.frame = False, None
+    else:
+      self.valid, self.frame = True, frame
+
+
+class VideoFile(FrameSource):
+  '''VideoFile reads frames from a video file with a prefetch
+  thread decoding ahead of the pipeline. The frame rate is
+  taken from the file unless given.'''
+
+  def __init__(self, path:str, fps:float=None,
+               mode:FrameSource.Mode=FrameSource.Mode.FAST,
+               loop:bool=False,
+               prefetch:int=4,
+               name:str='Video File'):
+    self.__path = path
+    self.__prefetch = prefetch
+    self.__cap = cv2.VideoCapture(path)
+    if not self.__cap.isOpened():
+      raise FileNotFoundError(
+        f"Video file cannot be opened: {path}")
+    fps = fps or self.__cap.get(cv2.CAP_PROP_FPS) or 30.0
+    super().__init__(fps=fps, mode=mode, loop=loop, name=name)
+    self.__prefetcher = self.__start()
+
+  def __start(self) -> Prefetcher:
+    def reader():
+      valid, frame = self.__cap.read()
+      return frame if valid else None
+    return Prefetcher(
+      reader, depth=self.__prefetch,
+      name=f"{self.name} Prefetch")
+
+  def _read(self) -> np.ndarray:
+    return self.__prefetcher.get()
+
+  def _rewind(self):
+    self.__prefetcher.close()
+    self.__cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    self.__prefetcher = self.__start()
+
+  def release(self):
+    self.__prefetcher.close()
+    self.__cap.release()
+
+
+class ImageSequence(FrameSource):
+  '''ImageSequence reads frames from a sequence of image
+  files, given either as a list of paths or a glob pattern
+  sorted by name, with a prefetch thread decoding ahead of
+  the pipeline.'''
+
+  def __init__(self, paths:Union[str, List[str]],
+               fps:float=30.0,
+               mode:FrameSource.Mode=FrameSource.Mode.FAST,
+               loop:bool=False,
+               prefetch:int=4,
+               name:str='Image Sequence'):
+    super().__init__(fps=fps, mode=mode, loop=loop, name=name)
+    if isinstance(paths, str):
+      paths = sorted(glob.glob(paths))
+    self.__paths = list(paths)
+    self.__prefetch = prefetch
+    self.__prefetcher = self.__start()
+
+  def __len__(self):
+    return len(self.__paths)
+
+  def __start(self) -> Prefetcher:
+    paths = iter(self.__paths)
+    def reader():
+      for path in paths:
+        frame = cv2.imread(path)
+        if frame is not None:
+          return frame
+      return None
+    return Prefetcher(
+      reader, depth=self.__prefetch,
+      name=f"{self.name} Prefetch")
+
+  def _read(self) -> np.ndarray:
+    return self.__prefetcher.get()
+
+  def _rewind(self):
+    self.__prefetcher.close()
+    self.__prefetcher = self.__start()
+
+  def release(self):
+    self.__prefetcher.close()
+
+
+class RawFrames(FrameSource):
+  '''RawFrames reads frames of a fixed shape and type stored
+  back to back in a raw binary file. The file is memory
+  mapped and the frames are delivered as read-only views
+  without copying.'''
+
+  def __init__(self, path:str, shape:Tuple[int],
+               dtype=np.uint8,
+               fps:float=30.0,
+               mode:FrameSource.Mode=FrameSource.Mode.FAST,
+               loop:bool=False,
+               name:str='Raw Frames'):
+    super().__init__(fps=fps, mode=mode, loop=loop, name=name)
+    frame_size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    count = os.path.getsize(path) // frame_size
+    self.__frames = np.memmap(
+      path, dtype=dtype, mode='r', shape=(count, *shape))
+    self.__position = 0
+
+  def __len__(self):
+    return len(self.__frames)
+
+  def _read(self) -> np.ndarray:
+    if self.__position >= len(self.__frames):
+      return None
+    frame = self.__frames[self.__position]
+    self.__position += 1
+    return frame
+
+  def _skip(self, count:int):
+    self.__position += count
+
+  def _rewind(self):
+    self.__position = 0
+
+
+class Synthetic(FrameSource):
+  '''Synthetic generates BGR frames of the given resolution
+  showing a filled disk moving over a static noise
+  background. The disk color and radius are configurable so
+  that the frames can drive color detection pipelines. The
+  number of frames is unlimited unless a count is given.'''
+
+  def __init__(self, width:int=640, height:int=480,
+               fps:float=30.0,
+               mode:FrameSource.Mode=FrameSource.Mode.FAST,
+               count:int=None,
+               color:Tuple[int,int,int]=(255,0,0),
+               radius:int=None,
+               seed:int=0,
+               name:str='Synthetic'):
+    super().__init__(fps=fps, mode=mode, loop=False, name=name)
+    generator = np.random.default_rng(seed=seed)
+    self.__background = generator.integers(
+      0, 64, size=(height, width, 3), dtype=np.uint8)
+    self.__count = count
+    self.__color = color
+    self.__radius = radius or max(1, min(width, height) // 10)
+    self.__index = 0
+
+  def _read(self) -> np.ndarray:
+    if self.__count is not None and self.__index >= self.__count:
+      return None
+    height, width, _ = self.__background.shape
+    phase = 2 * np.pi * self.__index / (4 * self.fps)
+    center = (
+      int(width / 2 + width / 3 * np.cos(phase)),
+      int(height / 2 + height / 3 * np.sin(phase)))
+    frame = self.__background.copy()
+    cv2.circle(frame, center, self.__radius, self.__color, -1)
+    self.__index += 1
+    return frame
+
+  def _skip(self, count:int):
+    self.__index += count
+
+  def _rewind(self):
+    self.__index = 0
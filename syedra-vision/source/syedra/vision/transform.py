@@ -1,15 +1,53 @@
 from __future__ import annotations
 from enum import Enum
+from typing import List, Tuple
 import cv2
+import numpy as np
 from syedra.core.block import Block, InputPort, OutputPort
+from .buffer import FramePool
 
 
 __all__ = [
+  'clip_roi',
+  'clear_outside',
   'Crop',
   'Convert',
+  'Stack',
+  'BatchConvert',
 ]
 
 
+def clip_roi(roi:Tuple[int,int,int,int],
+             shape:Tuple[int]) -> Tuple[int,int,int,int]:
+  '''Returns the region of interest (left, top, right, bottom)
+  clipped to an image of the given shape. Returns None, which
+  stands for the whole image, if the region is None, covers
+  the whole image or lies outside of it.'''
+  if roi is None:
+    return None
+  height, width = shape[:2]
+  left, top, right, bottom = roi
+  x1, y1 = max(int(left), 0), max(int(top), 0)
+  x2, y2 = min(int(right), width), min(int(bottom), height)
+  if x2 <= x1 or y2 <= y1:
+    return None
+  if (x1, y1, x2, y2) == (0, 0, width, height):
+    return None
+  return x1, y1, x2, y2
+
+
+def clear_outside(image:np.ndarray,
+                  region:Tuple[int,int,int,int]) -> np.ndarray:
+  '''Zeroes the pixels of the image outside of the clipped
+  region, leaving the pixels inside untouched.'''
+  x1, y1, x2, y2 = region
+  image[:y1] = 0
+  image[y2:] = 0
+  image[y1:y2, :x1] = 0
+  image[y1:y2, x2:] = 0
+  return image
+
+
 class Crop(Block):
 
   original = InputPort()
@@ -42,8 +80,12 @@ class Crop(Block):
 
 
 class Convert(Block):
+  '''Convert changes the color space of frames. If a region
+  of interest is given only the pixels in the region are
+  converted, the rest of the converted frame is zero.'''
 
   original = InputPort()
+  roi = InputPort(trigger=False)
   converted = OutputPort(initial=None)
 
   class Mapping(Enum):
@@ -51,13 +93,75 @@ class Convert(Block):
   
   def __init__(self,
                mapping:Mapping=Mapping.BGR2HSV,
-               name:str='Converter'):
+               name:str='Converter',
+               pool:FramePool=None):
     super().__init__(name=name)
     self.__mapping = mapping
+    self.__pool = pool
 
   def update(self):
-    if self.original is not None:
+    if self.original is None:
+      self.converted = None
+      return
+    dst = (None if self.__pool is None
+           else self.__pool.lease_like(self.original))
+    region = clip_roi(self.roi, self.original.shape)
+    if region is None:
       self.converted = cv2.cvtColor(
-        self.original, self.__mapping.value)
+        self.original, self.__mapping.value, dst=dst)
+      return
+    if dst is None:
+      dst = np.empty_like(self.original)
+    x1, y1, x2, y2 = region
+    cv2.cvtColor(
+      self.original[y1:y2, x1:x2], self.__mapping.value,
+      dst=dst[y1:y2, x1:x2])
+    self.converted = clear_outside(dst, region)
+
+
+class Stack(Block):
+  '''Stack combines the frames of several inputs into a batch
+  of shape (N, H, W, C) for the batch blocks. Input ports are
+  created with the given names in order. The batch is None if
+  any of the frames is missing.'''
+
+  batch = OutputPort(initial=None)
+
+  def __init__(self, input_ports:List[str],
+               name:str='Stack'):
+    super().__init__(name=name)
+    self.__names = list(input_ports)
+    for port_name in self.__names:
+      self._add_port(port_name, InputPort)
+
+  def update(self):
+    frames = [self[name].value for name in self.__names]
+    if any([frame is None for frame in frames]):
+      self.batch = None
+    else:
+      self.batch = np.stack(frames)
+
+
+class BatchConvert(Block):
+  '''Batch variant of Convert processing a stacked batch of
+  frames of shape (N, H, W, C) in a single native call.'''
+
+  original = InputPort()
+  converted = OutputPort(initial=None)
+
+  def __init__(self,
+               mapping:Convert.Mapping=Convert.Mapping.BGR2HSV,
+               name:str='Batch Converter'):
+    super().__init__(name=name)
+    self.__mapping = mapping
+
+  def update(self):
+    if self.original is not None:
+      count, height, width, channels = self.original.shape
+      rows = np.ascontiguousarray(self.original).reshape(
+        count * height, width, channels)
+      converted = cv2.cvtColor(rows, self.__mapping.value)
+      self.converted = converted.reshape(
+        count, height, width, *converted.shape[2:])
     else:
       self.converted = None
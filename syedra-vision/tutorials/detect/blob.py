@@ -1,7 +1,7 @@
 import cv2
 from syedra.core.block import Block
 from syedra.vision.camera import Camera
-from syedra.vision.display import Display, BlobSketch
+from syedra.vision.display import Renderer, Display, BlobSketch
 from syedra.vision.keyboard import Keyboard
 from syedra.vision.transform import Convert
 from syedra.vision.detect import Mask, Blob
@@ -16,12 +16,14 @@ if __name__ == '__main__':
     lower_color=[108, 50, 50],
     upper_color=[111, 255, 255])
   blob = Blob(min_size=200)
-  display_original = Display(name='Original')
-  display_converted = Display(name='Converted')
-  display_masked = Display(name='Masked')
+  renderer = Renderer(rate=30)
+  display_original = Display(
+    name='Original', renderer=renderer, copy=True)
+  display_converted = Display(name='Converted', renderer=renderer)
+  display_masked = Display(name='Masked', renderer=renderer)
   sketch_blob = BlobSketch()
-  display_blob = Display(name='Blob Sketch')
-  keyboard = Keyboard()
+  display_blob = Display(name='Blob Sketch', renderer=renderer)
+  keyboard = Keyboard(delay=1, renderer=renderer)
 
   camera['frame'] >> converter['original']
   converter['converted'] >> mask['original']
@@ -39,3 +41,5 @@ if __name__ == '__main__':
     Block.execute(camera)
   except Keyboard.QuitCommand:
     pass
+  finally:
+    renderer.close()
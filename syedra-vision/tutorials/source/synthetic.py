@@ -0,0 +1,33 @@
+from time import monotonic
+from syedra.core.block import Block
+from syedra.vision.source import Synthetic
+from syedra.vision.transform import Convert
+from syedra.vision.detect import Mask, Blob
+
+
+
+if __name__ == '__main__':
+
+  source = Synthetic(width=1280, height=720, count=300)
+  converter = Convert(mapping=Convert.Mapping.BGR2HSV)
+  mask = Mask(
+    lower_color=[110, 100, 100],
+    upper_color=[130, 255, 255])
+  blob = Blob(min_size=200)
+
+  source['frame'] >> converter['original']
+  converter['converted'] >> mask['original']
+  mask['selected'] >> blob['image']
+
+  schedule = Block.compile(source)
+  frames = 0
+  detection = None
+  start = monotonic()
+  while not source.exhausted:
+    Block.execute(schedule)
+    if source.valid:
+      frames += 1
+      detection = blob.detected
+  elapsed = monotonic() - start
+  print(f"{frames} frames in {elapsed:.2f} s: {frames/elapsed:.1f} fps")
+  print(f"last detection: {detection}")